@@ -1,18 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from iq_header import IQHeader
+from iq_time_index import IQTimeIndex
 import numpy as np
 import glob
 import logging
 import os
 import sys
-from scipy.interpolate import splprep, splev
-
-# Import APRiL package
-currentPath = os.path.dirname(os.path.realpath(__file__))
-april_path = os.path.join(os.path.join(currentPath, "APRiL"), "pyapril")
-sys.path.insert(0, april_path)
-from targetParamCalculator import calculate_bistatic_target_parameters
 
 """
     This scripts extracts the relevant parameters of an observed target tracks from  
@@ -36,6 +29,8 @@ from targetParamCalculator import calculate_bistatic_target_parameters
           
     The generate target reference track array will be save to the "target_info"
     folder of the VEGA measurement with ".trt" extension in text format.
+    The processing can also be started from the command line interface:
+        python vega_cli.py fr24-preproc <vega_measurement_path> --center-freq ...
     You can use the following sketch to interpret the data columns in this file:   
         
     +------------+-----------+----------+-----------+----------+-------+-----------+-------+---------+---------+
@@ -89,6 +84,8 @@ def GPX_interpolate(lat, lon, ele, speed, direct, tstamp, deg):
             :rtype: direct_interp: float numpy array
                 
     """
+    from scipy.interpolate import splprep, splev
+    
     # Check input data
     if not 1 <= deg <= 5:
         logging.error('Deg out of [1-5] range, skipping interpolation')
@@ -129,20 +126,26 @@ def GPX_interpolate(lat, lon, ele, speed, direct, tstamp, deg):
         
 
     return(lat_interp, lon_interp, ele_interp, speed_interp, direct_interp)#, tstamp_interp)    
-    
-
 
+def import_april():
+    """
+        Makes the APRiL package importable and returns the bistatic target
+        parameter calculator function. The package path is inserted into 
+        the module search path only when the track processing is started.
+    """
+    april_path = os.path.join(os.path.join(os.path.dirname(os.path.realpath(__file__)), "APRiL"), "pyapril")
+    if april_path not in sys.path:
+        sys.path.insert(0, april_path)
+    from targetParamCalculator import calculate_bistatic_target_parameters
+    return calculate_bistatic_target_parameters
 
 """
 ---------------------------
                            
-    P A R A M E T E R S    
+    C O N S T A N T S    
                             
 ---------------------------
 """
-#
-# C O N S T A N T S
-#
 # For GPS data interpolation
 EARTH_RADIUS = 6378137.0 # [meters]
 # For Doppler calulcation
@@ -150,226 +153,544 @@ KNOTS_TO_MPS = 0.51444444444
 FEET_TO_M = 0.3048
 c = 299792458
 
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-vega_measurement_path=  "/home/petot/WD/Vega/VEGAM20191225HR7C0S0"
-#"/media/petot/IQStorage0/VEGAM20191219K4C0S7"
-
-center_frequency = 90.3 *10**6 #634 *10 **6 # [Hz]
-
-# -> Rx, Tx positions
-# Elevation: Above Sea Level + Above Ground Level
-radar_lat = 46.678105 #47.393033
-radar_lon = 18.423188 # 19.287338
-radar_ele = 103 + 3 # [m]
-radar_bearing = 81 #111 + 6#113 # [deg]
-
-# Illuminator of Opportuniy #1
-lat_Szechenyi_hegy = 47.49166667
-long_Szechenyi_hegy = 18.97888889
-ele_Szechenyi_hegy = 457 + 182
-
-# Illuminator of Opportuniy #2
-lat_Harhat_hegy = 47.55027778
-long_Harhat_hegy = 19.00138889
-ele_Harhat_hegy = 439 + 94
-
-# Illuminator of Opportuniy #3
-lat_Szava_utca = 47.46861111
-long_Szava_utca = 19.12638889
-ele_Szava_utca = 115 + 107
-
-# Illuminator of Opportunity #4
-lat_uzd = 46.5911111
-long_uzd = 18.5791667
-ele_uzd = 204 + 94
-
-ioo_lat = lat_uzd
-ioo_lon = long_uzd
-ioo_ele = ele_uzd
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-#-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
-
-# -> Preconfiguration
-logging.basicConfig(level=logging.INFO)
-iq_folder_path       = os.path.join(vega_measurement_path,"iq")
-target_info_path     = os.path.join(vega_measurement_path,"target_info")
-ref_track_fname_temp = 'target_ref_track_'
-
-iqf_files = glob.glob(os.path.join(iq_folder_path,"*.iqf"))
-fr24_csv_files = glob.glob(os.path.join(target_info_path,"*.csv"))
-
-wavelength = c/center_frequency
 """
 ---------------------------
                            
-    P R O C E S S I N G 
+    P R O C E S S I N G    
                             
 ---------------------------
 """
-# Get the first and the last time indexes and time stamps
-for i, file_name in enumerate(iqf_files):
-    logging.debug("Reading: {:s}".format(file_name))    
-    
-    file_descr = open(file_name, "rb")
-    iq_header_bytes = file_descr.read(1024)
-    iq_header = IQHeader()
-    iq_header.decode_header(iq_header_bytes)
-    #iq_header.dump_header() # Enable this to see the IQ header content during conversion                  
-    file_descr.close()
-    file_index = int((file_name.split('_')[-1]).split('.')[0])    
-    if i==0:
-        start_file_index  = int(file_index)
-        stop_file_index   = int(file_index)
-        start_time_stamp  = iq_header.time_stamp
-        stop_time_stamp   = iq_header.time_stamp
-    else:
-        if iq_header.time_stamp < start_time_stamp:
-            start_time_stamp = iq_header.time_stamp
-        if iq_header.time_stamp > stop_time_stamp:
-            stop_time_stamp = iq_header.time_stamp
-        if file_index < start_file_index:
-            start_file_index = file_index
-        if file_index > stop_file_index:
-            stop_file_index = file_index
-            
-logging.info("Start file index: {:d}".format(start_file_index))
-logging.info("Stop file index: {:d}".format(stop_file_index))
-logging.info("First time stamp: {:d}".format(start_time_stamp))
-logging.info("Last time stamp: {:d}".format(stop_time_stamp))
-
-# Prepare reference target track array 
-
-target_ref_track_list = []
-for target_index, target_gpx_file in enumerate(fr24_csv_files):
-    logging.debug("Processing <{:s}> gpx track file".format(target_gpx_file))
+def _local_enu(lat, lon, ele, lat_0, lon_0):
+    """
+        Flat earth projection of geodetic coordinates onto a local east-north-up
+        frame with origin at (lat_0, lon_0)
+    """
+    return np.stack(np.broadcast_arrays(np.radians(lon - lon_0)*EARTH_RADIUS*np.cos(np.radians(lat_0)),
+                                        np.radians(lat - lat_0)*EARTH_RADIUS,
+                                        ele), axis=-1).astype(float)
 
-    # Allocate array
-    target_ref_track = np.zeros([stop_file_index-start_file_index+1, 10], dtype=float) 
-    # Fill time index column
-    target_ref_track[:,0] = np.arange(start_file_index, stop_file_index+1,1) 
-    
-    # Fill timestamp column
-    fname_prefix = iqf_files[0].split('_')[0]+"_"
-    for i in np.arange(start_file_index,stop_file_index+1,1):
-        file_name = (fname_prefix+str(i)+".iqf")
+def calc_bistatic_envelope(track, radar_lat, radar_lon, radar_ele, ioo_lat, ioo_lon, ioo_ele, wavelength):
+    """
+        Fast, vectorized approximation of the bistatic range and Doppler 
+        frequency of track points, used to screen the targets before the 
+        exact calculation. The positions are projected onto a local flat 
+        earth east-north-up frame centered at the middle of the baseline.
+        
+        Parameters:
+        -----------
+            :param: track     : Track points in the format of load_fr24_track
+            :param: radar_*   : Radar position [deg, deg, m]
+            :param: ioo_*     : Illuminator position [deg, deg, m]
+            :param: wavelength: Wavelength of the illuminator signal [m]
         
-        file_descr = open(file_name, "rb")
-        iq_header_bytes = file_descr.read(1024)
-        iq_header = IQHeader()
-        iq_header.decode_header(iq_header_bytes)
-        #iq_header.dump_header() # Enable this to see the IQ header content during conversion      
-        target_ref_track[i-start_file_index, 1] = iq_header.time_stamp    
-        file_descr.close()
+        Return values:
+        --------------
+            :return: Rb: Bistatic range of the track points [m]
+            :return: fD: Bistatic Doppler frequency of the track points [Hz]
+            
+            :rtype: Rb: float numpy array
+            :rtype: fD: float numpy array
+    """
+    lat_0 = (radar_lat + ioo_lat)/2
+    lon_0 = (radar_lon + ioo_lon)/2
+    radar_pos  = _local_enu(radar_lat, radar_lon, radar_ele, lat_0, lon_0)
+    ioo_pos    = _local_enu(ioo_lat, ioo_lon, ioo_ele, lat_0, lon_0)
+    target_pos = _local_enu(track[:,1], track[:,2], track[:,3]*FEET_TO_M, lat_0, lon_0)
+    
+    speed     = track[:,4]*KNOTS_TO_MPS
+    direction = np.radians(track[:,5])
+    target_vel = np.stack([speed*np.sin(direction), speed*np.cos(direction), np.zeros(len(track))], axis=-1)
     
-    # Fill Lattitude, Longitude, Altitude, Speed and Direction columns
+    ioo_target   = target_pos - ioo_pos
+    radar_target = target_pos - radar_pos
+    ioo_dist     = np.linalg.norm(ioo_target, axis=1)
+    radar_dist   = np.linalg.norm(radar_target, axis=1)
+    
+    Rb = ioo_dist + radar_dist - np.linalg.norm(radar_pos - ioo_pos)
+    fD = -np.sum(target_vel*(ioo_target/ioo_dist[:,None] + radar_target/radar_dist[:,None]), axis=1)/wavelength
+    return Rb, fD
+
+def load_fr24_track(csv_file):
     """
-    Processing Flight Radar 24 track filestarget_ref_track
-    Track format:
-        Timestamp,UTC,Callsign,Position,Altitude[feet],Speed[Ground Speed in Knots],Direction
-        e.g.:1576755262,2019-12-19T11:34:22Z,LOT5KM,"52.142853,20.98628",1525,0,153
+        Loads a FlightRadar24 CSV track file.
+        
+        Track format:
+            Timestamp,UTC,Callsign,Position,Altitude[feet],Speed[Ground Speed in Knots],Direction
+            e.g.:1576755262,2019-12-19T11:34:22Z,LOT5KM,"52.142853,20.98628",1525,0,153
+        
+        Return values:
+        --------------
+            :return: track: Track points sorted by the time stamps, the columns are 
+                            timestamp, latitude, longitude, altitude, speed and direction
+            :rtype: track : N x 6 float numpy array
     """
-
     # Load FlightRadar24 CSV file
-    ref_target_track_csv = np.loadtxt(target_gpx_file, delimiter= ',', skiprows=1, usecols=[0, 3, 4, 5, 6, 7],
+    ref_target_track_csv = np.loadtxt(csv_file, delimiter= ',', skiprows=1, usecols=[0, 3, 4, 5, 6, 7], ndmin=1,
                                       dtype={'names': ('timestamp', 'lat', 'long', 'alt', 'speed', 'dir'),
-                                             'formats': (np.int, 'U15', 'U15', np.int, np.int, np.int)})
-
-    target_reference_data=[]
-    first_row_flag  = 0
-    last_row_index  = 0
+                                             'formats': (int, 'U15', 'U15', int, int, int)})
+    track = np.zeros([len(ref_target_track_csv), 6], dtype=float)
+    track[:,0] = ref_target_track_csv['timestamp']
+    track[:,1] = [float(lat[1:]) for lat in ref_target_track_csv['lat']]
+    track[:,2] = [float(lon[:-1]) for lon in ref_target_track_csv['long']]
+    track[:,3] = ref_target_track_csv['alt']
+    track[:,4] = ref_target_track_csv['speed']
+    track[:,5] = ref_target_track_csv['dir']
+    return track[np.argsort(track[:,0], kind="stable")]
+
+class FR24TrackStore():
+    """
+        Stores FlightRadar24 tracks loaded once from the CSV files, so that the
+        same tracks can be shared by the processing of multiple measurements.
+        The track points are sorted by time, the tracks overlapping a time 
+        window are found with binary search on the sorted track start times.
+        
+        The tracks are also indexed on a coarse latitude-longitude grid, which
+        is used together with the time window query to select the targets 
+        within the coverage of a radar (see select_candidates). A track is 
+        registered in every grid cell covered by the bounding box of its 
+        segments, so aircrafts crossing a cell between two track points are
+        also found.
+    """
+    def __init__(self, csv_files, grid_size=0.1):
+        self.track_names = []
+        self.tracks = []
+        for csv_file in csv_files:
+            logging.debug("Loading <{:s}> FR24 track file".format(csv_file))
+            track = load_fr24_track(csv_file)
+            if not len(track):
+                logging.warning("Empty FR24 track file: {:s}".format(csv_file))
+                continue
+            self.track_names.append(os.path.basename(csv_file))
+            self.tracks.append(track)
+        
+        self.start_time_stamps = np.array([track[0,0] for track in self.tracks])
+        self.stop_time_stamps  = np.array([track[-1,0] for track in self.tracks])
+        self.start_order = np.argsort(self.start_time_stamps, kind="stable")
+        logging.info("FR24 track store: {:d} tracks loaded".format(len(self.tracks)))
+        
+        # Spatial index: (latitude cell, longitude cell) -> track indexes
+        self.grid_size = grid_size
+        self.cells = {}
+        for track_index, track in enumerate(self.tracks):
+            lat_cells = np.floor(track[:,1]/grid_size).astype(np.int64)
+            lon_cells = np.floor(track[:,2]/grid_size).astype(np.int64)
+            for cell in map(tuple, np.unique(np.stack([lat_cells, lon_cells], axis=1), axis=0)):
+                self.cells.setdefault(cell, set()).add(track_index)
+            
+            # Segments spanning more than one cell
+            spanning = np.flatnonzero((np.diff(lat_cells) != 0) | (np.diff(lon_cells) != 0))
+            for i in spanning:
+                for lat_cell in range(min(lat_cells[i], lat_cells[i+1]), max(lat_cells[i], lat_cells[i+1])+1):
+                    for lon_cell in range(min(lon_cells[i], lon_cells[i+1]), max(lon_cells[i], lon_cells[i+1])+1):
+                        self.cells.setdefault((lat_cell, lon_cell), set()).add(track_index)
     
-    for row_index, row in enumerate(ref_target_track_csv):    
-        if row[0] >= start_time_stamp and row[0] <= stop_time_stamp:
-            if first_row_flag == 0:
-                first_row_flag = 1
-                row_f = ref_target_track_csv[row_index-1]
-                target_reference_data.append([row_f[0],float(row_f[1][1:]), float(row_f[2][:-1]), row_f[3], row_f[4], row_f[5]])
-                
-            target_reference_data.append([row[0],float(row[1][1:]), float(row[2][:-1]), row[3], row[4], row[5]])
+    def __len__(self):
+        return len(self.tracks)
+    
+    def query(self, start_time_stamp, stop_time_stamp):
+        """
+            Returns the indexes of the tracks overlapping with the given time window
+        """
+        cut = np.searchsorted(self.start_time_stamps[self.start_order], stop_time_stamp, side="right")
+        candidates = self.start_order[0:cut]
+        return np.sort(candidates[self.stop_time_stamps[candidates] >= start_time_stamp])
+    
+    def extract(self, track_index, start_time_stamp, stop_time_stamp):
+        """
+            Returns the track points within the given time window extended with
+            one additional track point before and after the window.
+        """
+        track = self.tracks[track_index]
+        first = np.searchsorted(track[:,0], start_time_stamp, side="left")
+        last  = np.searchsorted(track[:,0], stop_time_stamp, side="right")
+        return track[max(first-1, 0):min(last+1, len(track))]
+
+    def interpolate(self, track_index, start_time_stamp, stop_time_stamp, res=1):
+        """
+            Returns the track linearly interpolated with "res" time resolution
+            in the part of the time window covered by the track.
+        """
+        track_points = self.extract(track_index, start_time_stamp, stop_time_stamp)
+        first_time_stamp = max(track_points[0,0], start_time_stamp)
+        last_time_stamp  = min(track_points[-1,0], stop_time_stamp)
+        time_stamps = np.arange(first_time_stamp, last_time_stamp+res, res)
+        time_stamps = time_stamps[time_stamps <= last_time_stamp]
+        track_interp = np.zeros([len(time_stamps), 6], dtype=float)
+        track_interp[:,0] = time_stamps
+        for col in range(1, 6):
+            track_interp[:,col] = np.interp(time_stamps, track_points[:,0], track_points[:,col])
+        return track_interp
+
+    def select_candidates(self, start_time_stamp, stop_time_stamp,
+                          radar_lat, radar_lon, radar_ele, ioo_lat, ioo_lon, ioo_ele, wavelength,
+                          max_bistatic_range, max_doppler=None):
+        """
+            Selects the tracks, that are within the given bistatic range and 
+            Doppler envelope in the given time window.
             
-            # Store the last row index. 
-            # It will be used later to extend the overlaid time interval with plus 1 data row from the reference data
-            if last_row_index < row_index:
-                last_row_index = row_index
-    # Extend overlaid time interval
-    row = ref_target_track_csv[last_row_index+1]
-    target_reference_data.append([row[0],float(row[1][1:]), float(row[2][:-1]), row[3], row[4], row[5]])
-                
-    if len(target_reference_data)==0:
-        logging.warning("Reference data can not be extracted for target ID: {:d}".format(target_index))
-    else:        
+            At first the tracks overlapping the time window are queried (see 
+            query) and those are kept, which are registered in the grid cells 
+            of the bounding box of the maximum bistatic range ellipse. Then the
+            candidate tracks are linearly interpolated with 1 second resolution
+            within the time window, the same way as the reference tracks are 
+            generated, and the bistatic parameters of the interpolated points 
+            are evaluated with calc_bistatic_envelope. This way targets crossing
+            the envelope between two FR24 track points are also selected.
+            A track is selected in case it has at least one interpolated point 
+            within both the range and the Doppler limits. In case only the 
+            Doppler limit is specified, the spatial grid is not used and all 
+            the tracks of the time window are screened.
+            
+            Parameters:
+            -----------
+                :param: max_bistatic_range: Maximum bistatic range [m], None: no limit
+                :param: max_doppler       : Maximum absolute bistatic Doppler 
+                                            frequency [Hz], None: no limit
+            
+            Return values:
+            --------------
+                :return: track_indexes: Indexes of the selected tracks
+                :rtype: track_indexes : int numpy array
         """
-        Interpolate missing values
-        This code is originated from: https://github.com/remisalmon/GPX_interpolate
-        Author: Remi Salmon
-        """    
-        # Convert reference data to numpy array
-        target_reference_data_array= np.array(target_reference_data)
-        
-        # Perform expanding and interpolation
-        (lat_interp, lon_interp, ele_interp, speed_interp, direct_interp) = \
-        GPX_interpolate(lat=target_reference_data_array[:,1], 
-                        lon=target_reference_data_array[:,2],
-                        ele=target_reference_data_array[:,3],
-                        speed=target_reference_data_array[:,4],
-                        direct=target_reference_data_array[:,5],
-                        tstamp=target_reference_data_array[:,0],
-                        deg=1)
-        interp_target_reference_data = np.zeros([len(lat_interp),6])
-        interp_target_reference_data[:,0] = np.arange(target_reference_data_array[0,0], target_reference_data_array[-1,0]+1,1)
-        interp_target_reference_data[:,1] = lat_interp
-        interp_target_reference_data[:,2] = lon_interp
-        interp_target_reference_data[:,3] = ele_interp
-        interp_target_reference_data[:,4] = speed_interp
-        interp_target_reference_data[:,5] = direct_interp
-        
-        # Assign interpolated target reference data to the measurements, based on the time stamp difference
-        for t in np.arange(0,stop_file_index-start_file_index+1,1):                
-            time_diff = abs(interp_target_reference_data[:,0]-target_ref_track[t,1])
-            min_tim_diff_index = np.argmin(time_diff)
+        candidates = self.query(start_time_stamp, stop_time_stamp)
+        if max_bistatic_range is not None:
+            # Bounding box of the bistatic range ellipse, foci: radar and illuminator
+            lat_0 = (radar_lat + ioo_lat)/2
+            lon_0 = (radar_lon + ioo_lon)/2
+            baseline = np.linalg.norm(_local_enu(radar_lat, radar_lon, radar_ele, lat_0, lon_0) - 
+                                      _local_enu(ioo_lat, ioo_lon, ioo_ele, lat_0, lon_0))
+            semi_major = (max_bistatic_range + baseline)/2
+            lat_span = np.degrees(semi_major/EARTH_RADIUS)
+            lon_span = np.degrees(semi_major/(EARTH_RADIUS*np.cos(np.radians(lat_0))))
+            
+            lat_cells = range(int(np.floor((lat_0-lat_span)/self.grid_size)), int(np.floor((lat_0+lat_span)/self.grid_size))+1)
+            lon_cells = range(int(np.floor((lon_0-lon_span)/self.grid_size)), int(np.floor((lon_0+lon_span)/self.grid_size))+1)
             
-            target_ref_track[t, 2] = interp_target_reference_data[np.argmin(time_diff),1]  # Latitude
-            target_ref_track[t, 3] = interp_target_reference_data[np.argmin(time_diff),2]  # Longitude
-            target_ref_track[t, 4] = interp_target_reference_data[np.argmin(time_diff),3]  # Altitude
-            target_ref_track[t, 5] = interp_target_reference_data[np.argmin(time_diff),4]  # Speed
-            target_ref_track[t, 6] = interp_target_reference_data[np.argmin(time_diff),5]  # Direction
+            in_coverage = set()
+            for lat_cell in lat_cells:
+                for lon_cell in lon_cells:
+                    in_coverage |= self.cells.get((lat_cell, lon_cell), set())
+            candidates = [track_index for track_index in candidates if track_index in in_coverage]
         
-        # Store the prepared target reference track array
-        target_ref_track_list.append(target_ref_track)
+        track_indexes = []
+        for track_index in candidates:
+            track_points = self.interpolate(track_index, start_time_stamp, stop_time_stamp)
+            Rb, fD = calc_bistatic_envelope(track_points, radar_lat, radar_lon, radar_ele, 
+                                            ioo_lat, ioo_lon, ioo_ele, wavelength)
+            in_envelope = np.ones(len(Rb), dtype=bool)
+            if max_bistatic_range is not None:
+                in_envelope &= Rb <= max_bistatic_range
+            if max_doppler is not None:
+                in_envelope &= np.abs(fD) <= max_doppler
+            if np.any(in_envelope):
+                track_indexes.append(track_index)
+        logging.info("Target candidates: {:d} selected from {:d} tracks in the coverage".format(len(track_indexes), len(candidates)))
+        return np.array(track_indexes, dtype=int)
+
+def generate_target_ref_tracks(vega_measurement_path, center_frequency,
+                               radar_lat, radar_lon, radar_ele, radar_bearing,
+                               ioo_lat, ioo_lon, ioo_ele, track_store=None,
+                               max_bistatic_range=None, max_doppler=None):
+    """
+        Generates the target reference track files (".trt") of a VEGA 
+        measurement from the FlightRadar24 CSV files stored in the 
+        "target_info" folder of the measurement.
         
-        """
-            Calculate bistatic range and bistatic Doppler frequencies from the 
-            positions and the velocities of the target and the location of the radar unit.
-        """    
-        logging.info("Calcaulating bistatic range and Doppler for target ID: {:d}".format(target_index))
-
-       
-        for t in np.arange(0,stop_file_index-start_file_index+1,1):
+        Parameters:
+        -----------
+            :param: vega_measurement_path: Root folder of the VEGA measurement
+            :param: center_frequency     : Carrier frequency of the illuminator [Hz]
+            :param: radar_lat            : Latitude of the radar [deg]
+            :param: radar_lon            : Longitude of the radar [deg]
+            :param: radar_ele            : Elevation of the radar (ASL + AGL) [m]
+            :param: radar_bearing        : Bearing of the radar antenna [deg]
+            :param: ioo_lat              : Latitude of the illuminator [deg]
+            :param: ioo_lon              : Longitude of the illuminator [deg]
+            :param: ioo_ele              : Elevation of the illuminator (ASL + AGL) [m]
+            :param: track_store          : Shared FR24 track store. In case it is not
+                                           specified, the tracks are loaded from the 
+                                           "target_info" folder of the measurement.
             
-            (Rb, fD, theta) = \
-            calculate_bistatic_target_parameters(radar_lat, 
-                                                 radar_lon, 
-                                                 radar_ele, 
-                                                 radar_bearing,
-                                                 ioo_lat, 
-                                                 ioo_lon, 
-                                                 ioo_ele,
-                                                 target_lat=target_ref_track[t, 2] , 
-                                                 target_lon=target_ref_track[t, 3],
-                                                 target_ele=target_ref_track[t, 4]* FEET_TO_M,
-                                                 target_speed=target_ref_track[t, 5]*KNOTS_TO_MPS , 
-                                                 target_dir=target_ref_track[t, 6],
-                                                 wavelength=wavelength)
-            target_ref_track[t, 7] =  Rb
-            target_ref_track[t, 8] =  fD
-            target_ref_track[t, 9] = theta
-        logging.info("Saving target reference track array for target ID: {:d}".format(target_index))
-        fname = os.path.join(target_info_path, ref_track_fname_temp+str(target_index)+".trt")
-        np.savetxt(fname, target_ref_track)
-logging.info("Target reference track generation finished")
+            :param: max_bistatic_range   : In case it is specified, only the targets 
+                                           within this bistatic range [m] are
+                                           processed (see FR24TrackStore.select_candidates)
+            :param: max_doppler          : In case it is specified, only the targets 
+                                           within this absolute bistatic Doppler 
+                                           frequency [Hz] are processed
+            
+            The generated ".trt" files are named after the FR24 CSV file of the
+            track: "target_ref_track_<CSV file name without extension>.trt". 
+            The ".trt" files of a previous run are removed from the 
+            "target_info" folder before the new ones are written, so the folder
+            contains only the targets selected by the current limits.
+    """
+    calculate_bistatic_target_parameters = import_april()
+    
+    # -> Preconfiguration
+    iq_folder_path       = os.path.join(vega_measurement_path,"iq")
+    target_info_path     = os.path.join(vega_measurement_path,"target_info")
+    ref_track_fname_temp = 'target_ref_track_'
+
+    if track_store is None:
+        track_store = FR24TrackStore(sorted(glob.glob(os.path.join(target_info_path,"*.csv"))))
+
+    wavelength = c/center_frequency
+
+    # Get the first and the last time indexes and time stamps
+    time_index = IQTimeIndex.get(iq_folder_path, data_frames_only=False)
+    file_indexes = np.array([int((file_name.split('_')[-1]).split('.')[0]) for file_name in time_index.file_names])
+    start_file_index = int(np.min(file_indexes))
+    stop_file_index  = int(np.max(file_indexes))
+    start_time_stamp = time_index.first_time_stamp
+    stop_time_stamp  = time_index.last_time_stamp
+
+    logging.info("Start file index: {:d}".format(start_file_index))
+    logging.info("Stop file index: {:d}".format(stop_file_index))
+    logging.info("First time stamp: {:d}".format(start_time_stamp))
+    logging.info("Last time stamp: {:d}".format(stop_time_stamp))
+
+    # Prepare reference target track array 
+
+    target_ref_track_list = []
+    if max_bistatic_range is None and max_doppler is None:
+        target_indexes = track_store.query(start_time_stamp, stop_time_stamp)
+    else:
+        target_indexes = track_store.select_candidates(start_time_stamp, stop_time_stamp,
+                                                       radar_lat, radar_lon, radar_ele,
+                                                       ioo_lat, ioo_lon, ioo_ele, wavelength,
+                                                       max_bistatic_range, max_doppler)
+
+    # Remove the outputs of the previous run
+    for fname in glob.glob(os.path.join(target_info_path, ref_track_fname_temp+"*.trt")):
+        logging.debug("Removing previous target reference track file: {:s}".format(fname))
+        os.remove(fname)
+
+    for target_index in target_indexes:
+        target_id = os.path.splitext(track_store.track_names[target_index])[0]
+        logging.debug("Processing <{:s}> FR24 track".format(track_store.track_names[target_index]))
+
+        # Allocate array
+        target_ref_track = np.zeros([stop_file_index-start_file_index+1, 10], dtype=float) 
+        # Fill time index column
+        target_ref_track[:,0] = np.arange(start_file_index, stop_file_index+1,1) 
+
+        # Fill timestamp column
+        target_ref_track[file_indexes-start_file_index, 1] = time_index.time_stamps
+
+        # Fill Lattitude, Longitude, Altitude, Speed and Direction columns
+        # Select the track points overlaid with the measurement, extended with plus 1 data row on both sides
+        target_reference_data_array = track_store.extract(target_index, start_time_stamp, stop_time_stamp)
+
+        if len(target_reference_data_array) < 2:
+            logging.warning("Reference data can not be extracted for target ID: {:s}".format(target_id))
+        else:        
+            """
+            Interpolate missing values
+            This code is originated from: https://github.com/remisalmon/GPX_interpolate
+            Author: Remi Salmon
+            """    
+            # Perform expanding and interpolation
+            (lat_interp, lon_interp, ele_interp, speed_interp, direct_interp) = \
+            GPX_interpolate(lat=target_reference_data_array[:,1], 
+                            lon=target_reference_data_array[:,2],
+                            ele=target_reference_data_array[:,3],
+                            speed=target_reference_data_array[:,4],
+                            direct=target_reference_data_array[:,5],
+                            tstamp=target_reference_data_array[:,0],
+                            deg=1)
+            interp_target_reference_data = np.zeros([len(lat_interp),6])
+            interp_target_reference_data[:,0] = np.arange(target_reference_data_array[0,0], target_reference_data_array[-1,0]+1,1)
+            interp_target_reference_data[:,1] = lat_interp
+            interp_target_reference_data[:,2] = lon_interp
+            interp_target_reference_data[:,3] = ele_interp
+            interp_target_reference_data[:,4] = speed_interp
+            interp_target_reference_data[:,5] = direct_interp
+
+            # Assign interpolated target reference data to the measurements, based on the time stamp difference
+            for t in np.arange(0,stop_file_index-start_file_index+1,1):                
+                time_diff = abs(interp_target_reference_data[:,0]-target_ref_track[t,1])
+                min_tim_diff_index = np.argmin(time_diff)
+
+                target_ref_track[t, 2] = interp_target_reference_data[np.argmin(time_diff),1]  # Latitude
+                target_ref_track[t, 3] = interp_target_reference_data[np.argmin(time_diff),2]  # Longitude
+                target_ref_track[t, 4] = interp_target_reference_data[np.argmin(time_diff),3]  # Altitude
+                target_ref_track[t, 5] = interp_target_reference_data[np.argmin(time_diff),4]  # Speed
+                target_ref_track[t, 6] = interp_target_reference_data[np.argmin(time_diff),5]  # Direction
+
+            # Store the prepared target reference track array
+            target_ref_track_list.append(target_ref_track)
+
+            """
+                Calculate bistatic range and bistatic Doppler frequencies from the 
+                positions and the velocities of the target and the location of the radar unit.
+            """    
+            logging.info("Calcaulating bistatic range and Doppler for target ID: {:s}".format(target_id))
+
+
+            for t in np.arange(0,stop_file_index-start_file_index+1,1):
+
+                (Rb, fD, theta) = \
+                calculate_bistatic_target_parameters(radar_lat, 
+                                                     radar_lon, 
+                                                     radar_ele, 
+                                                     radar_bearing,
+                                                     ioo_lat, 
+                                                     ioo_lon, 
+                                                     ioo_ele,
+                                                     target_lat=target_ref_track[t, 2] , 
+                                                     target_lon=target_ref_track[t, 3],
+                                                     target_ele=target_ref_track[t, 4]* FEET_TO_M,
+                                                     target_speed=target_ref_track[t, 5]*KNOTS_TO_MPS , 
+                                                     target_dir=target_ref_track[t, 6],
+                                                     wavelength=wavelength)
+                target_ref_track[t, 7] =  Rb
+                target_ref_track[t, 8] =  fD
+                target_ref_track[t, 9] = theta
+            logging.info("Saving target reference track array for target ID: {:s}".format(target_id))
+            fname = os.path.join(target_info_path, ref_track_fname_temp+target_id+".trt")
+            np.savetxt(fname, target_ref_track)
+    logging.info("Target reference track generation finished")
+
+"""
+---------------------------
+                           
+    B A T C H   M O D E    
+                            
+---------------------------
+"""
+_worker_track_store = None
 
+def _init_batch_worker(track_store):
+    global _worker_track_store
+    _worker_track_store = track_store
+    logging.basicConfig(level=logging.INFO)
 
+def _process_batch_measurement(measurement):
+    generate_target_ref_tracks(track_store=_worker_track_store, **measurement)
+    return measurement["vega_measurement_path"]
 
+def load_batch_config(config_file):
+    """
+        Loads the batch processing configuration from a JSON file.
+        
+        Configuration format:
+            {
+                "fr24_csv_files": ["/path/to/fr24/*.csv", ...],
+                "measurements"  : [{"vega_measurement_path": "...",
+                                    "center_frequency"     : 90.3e6,
+                                    "radar_lat": ..., "radar_lon": ..., "radar_ele": ..., "radar_bearing": ...,
+                                    "ioo_lat"  : ..., "ioo_lon"  : ..., "ioo_ele"  : ...,
+                                    "max_bistatic_range": ..., "max_doppler": ...}, # Optional
+                                   ...]
+            }
+        
+        Return values:
+        --------------
+            :return: csv_files   : FR24 CSV files matching the configured patterns
+            :return: measurements: Processing parameters of the measurements, the keys
+                                   match the parameters of generate_target_ref_tracks
+            
+            :rtype: csv_files   : list of strings
+            :rtype: measurements: list of dicts
+    """
+    import json
+    with open(config_file, "r") as config_fd:
+        config = json.load(config_fd)
+    csv_files = []
+    for csv_pattern in config["fr24_csv_files"]:
+        csv_files.extend(sorted(glob.glob(csv_pattern)))
+    return csv_files, config["measurements"]
+
+def process_measurement_batch(measurements, track_store, max_workers=None):
+    """
+        Generates the target reference tracks of multiple measurements in 
+        parallel. The FR24 tracks are loaded only once into the shared 
+        track store, which is passed to the worker processes at startup.
+        
+        Parameters:
+        -----------
+            :param: measurements: Processing parameters of the measurements, see 
+                                  load_batch_config
+            :param: track_store : Shared FR24 track store
+            :param: max_workers : Number of worker processes (None: executor default)
+            
+            :type: measurements: list of dicts
+            :type: track_store : FR24TrackStore
+            :type: max_workers : int
+        
+        Return values:
+        --------------
+            :return: failed: Measurement paths, whose processing failed
+            :rtype: failed : list of strings
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    failed = []
+    with ProcessPoolExecutor(max_workers=max_workers, 
+                             initializer=_init_batch_worker, 
+                             initargs=(track_store,)) as executor:
+        futures = {executor.submit(_process_batch_measurement, measurement): measurement["vega_measurement_path"]
+                   for measurement in measurements}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                logging.info("Finished: {:s}".format(futures[future]))
+            except Exception as e:
+                logging.error("Processing failed: {:s} ({:s})".format(futures[future], repr(e)))
+                failed.append(futures[future])
+    return failed
+
+
+if __name__ == "__main__":
+    """
+    ---------------------------
+                               
+        P A R A M E T E R S    
+                                
+    ---------------------------
+    """
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    vega_measurement_path=  "/home/petot/WD/Vega/VEGAM20191225HR7C0S0"
+    #"/media/petot/IQStorage0/VEGAM20191219K4C0S7"
+
+    center_frequency = 90.3 *10**6 #634 *10 **6 # [Hz]
+
+    # -> Rx, Tx positions
+    # Elevation: Above Sea Level + Above Ground Level
+    radar_lat = 46.678105 #47.393033
+    radar_lon = 18.423188 # 19.287338
+    radar_ele = 103 + 3 # [m]
+    radar_bearing = 81 #111 + 6#113 # [deg]
+
+    # Illuminator of Opportuniy #1
+    lat_Szechenyi_hegy = 47.49166667
+    long_Szechenyi_hegy = 18.97888889
+    ele_Szechenyi_hegy = 457 + 182
+
+    # Illuminator of Opportuniy #2
+    lat_Harhat_hegy = 47.55027778
+    long_Harhat_hegy = 19.00138889
+    ele_Harhat_hegy = 439 + 94
+
+    # Illuminator of Opportuniy #3
+    lat_Szava_utca = 47.46861111
+    long_Szava_utca = 19.12638889
+    ele_Szava_utca = 115 + 107
+
+    # Illuminator of Opportunity #4
+    lat_uzd = 46.5911111
+    long_uzd = 18.5791667
+    ele_uzd = 204 + 94
+
+    ioo_lat = lat_uzd
+    ioo_lon = long_uzd
+    ioo_ele = ele_uzd
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    #-----MANDATORY PROCESSING PARAMETERS-----MANDATORY PROCESSING PARAMETERS-----
+    
+    logging.basicConfig(level=logging.INFO)
+    generate_target_ref_tracks(vega_measurement_path, center_frequency,
+                               radar_lat, radar_lon, radar_ele, radar_bearing,
+                               ioo_lat, ioo_lon, ioo_ele)
@@ -1,5 +1,8 @@
 from iq_header import IQHeader
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import logging
+import os
 def load_iq(file_name):
     """
         Description: 
@@ -36,3 +39,295 @@ def load_iq(file_name):
     iq_samples = iq_cf64.copy()
     
     return iq_samples, iq_header
+
+def get_frame_index(file_name):
+    """
+        Description: 
+        ------------
+        Parses the frame index from the name of an IQ frame file. Both the
+        "<prefix>_<index>.iqf" and the "<index>.iqf" naming is supported,
+        only the base name of the path is interpreted.
+        
+        Parameters:
+        -----------
+        :param: file_name: IQ frame file name with or without path
+        :type: file_name : string
+        
+        Return values:
+        --------------
+        :return: frame_index: Index of the frame, -1 if the name does not 
+                              contain an index
+        :rtype: frame_index : int
+    """
+    try:
+        return int((os.path.basename(file_name).split('_')[-1]).split('.')[0])
+    except ValueError:
+        return -1
+
+# Numpy representation of the IQ header, the field alignment matches the 
+# native struct layout used by IQHeader.decode_header (1024 byte in total)
+IQ_HEADER_DTYPE = np.dtype([("sync_word",            "<u4"),
+                            ("frame_type",           "<u4"),
+                            ("hardware_id",          "S16"),
+                            ("unit_id",              "<u4"),
+                            ("active_ant_chs",       "<u4"),
+                            ("ioo_type",             "<u4"),
+                            ("rf_center_freq",       "<u8"),
+                            ("adc_sampling_freq",    "<u8"),
+                            ("sampling_freq",        "<u8"),
+                            ("cpi_length",           "<u4"),
+                            ("time_stamp",           "<u8"),
+                            ("daq_block_index",      "<u4"),
+                            ("cpi_index",            "<u4"),
+                            ("ext_integration_cntr", "<u8"),
+                            ("data_type",            "<u4"),
+                            ("sample_bit_depth",     "<u4"),
+                            ("adc_overdrive_flags",  "<u4"),
+                            ("if_gains",             "<u4", (32,)),
+                            ("delay_sync_flag",      "<u4"),
+                            ("iq_sync_flag",         "<u4"),
+                            ("sync_state",           "<u4"),
+                            ("noise_source_state",   "<u4"),
+                            ("reserved",             "<u4", (192,)),
+                            ("header_version",       "<u4")], align=True)
+
+def decode_headers(header_bytes):
+    """
+        Description: 
+        ------------
+        Decodes multiple IQ headers at once. The headers have to be stored 
+        consecutively in the input buffer.
+        
+        Parameters:
+        -----------
+        :param: header_bytes: Buffer of N x 1024 bytes 
+        :type: header_bytes : bytes like object
+        
+        Return values:
+        --------------
+        :return: iq_headers: Decoded header fields, the field names are 
+                             identical with the attributes of IQHeader
+        :rtype: iq_headers : numpy structured array with IQ_HEADER_DTYPE
+    """
+    return np.frombuffer(header_bytes, dtype=IQ_HEADER_DTYPE)
+
+def read_header_block(file_names, fadvise=True, out=None, offset=0):
+    """
+        Description: 
+        ------------
+        Reads the headers of multiple IQ frames into a single preallocated 
+        buffer, which can be passed directly to decode_headers. The files are
+        accessed with low level os.open/os.readv calls, the payload sections
+        are not read.
+        
+        With fadvise enabled, read-ahead is disabled on the files with
+        posix_fadvise (where available), so that the payloads do not pollute
+        the page cache during header scans.
+        
+        Incomplete headers are zero filled in the buffer, these can be
+        recognized from the returned read lengths.
+        
+        The headers can also be read into a caller provided buffer, this way
+        multiple calls (e.g. from worker threads processing different chunks
+        of the file list) can fill a single shared buffer directly.
+        
+        Parameters:
+        -----------
+        :param: file_names: List of IQ frame file names
+        :param: fadvise   : Give random access hint to the kernel
+        :param: out       : Buffer to read the headers into, None: a new 
+                            buffer is allocated
+        :param: offset    : Header slot of the out buffer, where the header of
+                            the first file is placed
+        
+        :type: file_names: list of strings
+        :type: fadvise   : bool
+        :type: out       : bytearray or writable memoryview
+        :type: offset    : int
+        
+        Return values:
+        --------------
+        :return: header_bytes: Headers of the files, N x 1024 bytes, or the 
+                               out buffer in case it is specified
+        :return: read_lengths: Number of header bytes read from the files
+        :return: file_sizes  : Size of the files in bytes
+        
+        :rtype: header_bytes: bytearray
+        :rtype: read_lengths: int numpy array
+        :rtype: file_sizes  : int numpy array
+    """
+    header_size = IQ_HEADER_DTYPE.itemsize
+    if out is None:
+        header_bytes = bytearray(len(file_names)*header_size)
+        offset = 0
+    else:
+        header_bytes = out
+    header_view = memoryview(header_bytes).cast("B")
+    if len(header_view) < (offset+len(file_names))*header_size:
+        header_view.release()
+        raise ValueError("Output buffer is too small for {:d} headers at slot {:d}".format(len(file_names), offset))
+    read_lengths = np.zeros(len(file_names), dtype=np.int64)
+    file_sizes = np.zeros(len(file_names), dtype=np.int64)
+    
+    use_fadvise = fadvise and hasattr(os, "posix_fadvise")
+    use_readv = hasattr(os, "readv")
+    open_flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+    for i, file_name in enumerate(file_names):
+        fd = os.open(file_name, open_flags)
+        try:
+            if use_fadvise:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_RANDOM)
+            file_sizes[i] = os.fstat(fd).st_size
+            
+            header_buffer = header_view[(offset+i)*header_size:(offset+i+1)*header_size]
+            read_length = 0
+            while read_length < header_size:
+                if use_readv:
+                    chunk_length = os.readv(fd, [header_buffer[read_length:]])
+                else:
+                    chunk = os.read(fd, header_size-read_length)
+                    chunk_length = len(chunk)
+                    header_buffer[read_length:read_length+chunk_length] = chunk
+                if not chunk_length: # End of file
+                    break
+                read_length += chunk_length
+            if read_length < header_size:
+                header_buffer[read_length:] = bytes(header_size-read_length)
+            read_lengths[i] = read_length
+        finally:
+            os.close(fd)
+    
+    header_view.release()
+    return header_bytes, read_lengths, file_sizes
+
+def read_headers(file_names, fadvise=True):
+    """
+        Description: 
+        ------------
+        Reads and decodes the IQ headers of the given IQ frames
+        
+        Parameters:
+        -----------
+        :param: file_names: List of IQ frame file names
+        :param: fadvise   : Give random access hint to the kernel, see read_header_block
+        
+        :type: file_names: list of strings
+        :type: fadvise   : bool
+        
+        Return values:
+        --------------
+        :return: iq_headers: Decoded header fields, the i-th record belongs to 
+                             the i-th file
+        :rtype: iq_headers : numpy structured array with IQ_HEADER_DTYPE
+    """
+    header_bytes, read_lengths, _ = read_header_block(file_names, fadvise)
+    if np.any(read_lengths != IQ_HEADER_DTYPE.itemsize):
+        incomplete = file_names[int(np.flatnonzero(read_lengths != IQ_HEADER_DTYPE.itemsize)[0])]
+        raise ValueError("Incomplete IQ header in {:s}".format(incomplete))
+    return decode_headers(header_bytes)
+
+PAYLOAD_STAT_NAMES = ("mean_power", "dc_offset", "peak_magnitude", "clipping_ratio", "power_imbalance")
+
+def calc_payload_stats(iq_samples, clip_level=1.0):
+    """
+        Description: 
+        ------------
+        Calculates per channel signal level statistics of a single IQ frame
+        payload. All the statistics are evaluated with vectorized reductions
+        along the sample axis.
+        
+        Parameters:
+        -----------
+        :param: iq_samples: IQ sample matrix of the frame
+        :param: clip_level: Absolute I or Q sample value at which the sample is
+                            considered to be clipped
+        
+        :type: iq_samples: M x N complex numpy array
+        :type: clip_level: float
+        
+        Return values:
+        --------------
+        :return: payload_stats: Per channel statistics, keys are listed in
+                                PAYLOAD_STAT_NAMES:
+                                    - mean_power     : Mean sample power 
+                                    - dc_offset      : Magnitude of the sample mean
+                                    - peak_magnitude : Maximum sample magnitude
+                                    - clipping_ratio : Ratio of the clipped samples
+                                    - power_imbalance: Channel power relative to the
+                                                       mean power of all the 
+                                                       channels [dB]
+        
+        :rtype: payload_stats: dict of M long float numpy arrays
+    """
+    i_samples = iq_samples.real
+    q_samples = iq_samples.imag
+    
+    sample_powers = i_samples**2 + q_samples**2
+    mean_power = np.mean(sample_powers, axis=1)
+    
+    clipped = (np.abs(i_samples) >= clip_level) | (np.abs(q_samples) >= clip_level)
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power_imbalance = 10*np.log10(mean_power/np.mean(mean_power))
+    
+    payload_stats = dict(mean_power      = mean_power,
+                         dc_offset       = np.abs(np.mean(iq_samples, axis=1)),
+                         peak_magnitude  = np.sqrt(np.max(sample_powers, axis=1)),
+                         clipping_ratio  = np.mean(clipped, axis=1),
+                         power_imbalance = power_imbalance)
+    return payload_stats
+
+def stream_payload_stats(iqf_files, ch_no, clip_level=1.0, chunk_size=64, max_workers=None):
+    """
+        Description: 
+        ------------
+        Calculates the payload statistics for a list of IQ frames. The frames 
+        are processed in chunks, within a chunk the frames are loaded and 
+        reduced in parallel. Only the per frame statistics are retained, thus
+        the memory consumption is bounded by the chunk size and not by the 
+        length of the recording.
+        
+        Frames with different channel count than "ch_no" are filled with NaN
+        values in the missing channels.
+        
+        Parameters:
+        -----------
+        :param: iqf_files  : List of IQ frame file names to process
+        :param: ch_no      : Number of channels to evaluate
+        :param: clip_level : Clipping level, see calc_payload_stats
+        :param: chunk_size : Number of frames processed in one chunk
+        :param: max_workers: Number of worker threads (None: executor default)
+        
+        :type: iqf_files  : list of strings
+        :type: ch_no      : int
+        :type: clip_level : float
+        :type: chunk_size : int
+        :type: max_workers: int
+        
+        Return values:
+        --------------
+        :return: payload_stats: Per channel and per frame statistics, keys are 
+                                listed in PAYLOAD_STAT_NAMES
+        
+        :rtype: payload_stats: dict of M x K float numpy arrays, where K is the
+                               number of processed frames
+    """
+    frame_no = len(iqf_files)
+    payload_stats = {}
+    for stat_name in PAYLOAD_STAT_NAMES:
+        payload_stats[stat_name] = np.full([ch_no, frame_no], np.nan, dtype=np.float32)
+    
+    def _frame_stats(file_name):
+        iq_samples, _ = load_iq(file_name)
+        return calc_payload_stats(iq_samples[0:ch_no, :], clip_level)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_start in range(0, frame_no, chunk_size):
+            chunk_files = iqf_files[chunk_start:chunk_start+chunk_size]
+            logging.debug("Payload analysis: {:d}/{:d}".format(chunk_start+len(chunk_files), frame_no))
+            for frame_offset, frame_stats in enumerate(executor.map(_frame_stats, chunk_files)):
+                for stat_name in PAYLOAD_STAT_NAMES:
+                    stat_values = frame_stats[stat_name]
+                    payload_stats[stat_name][0:len(stat_values), chunk_start+frame_offset] = stat_values
+    
+    return payload_stats
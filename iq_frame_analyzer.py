@@ -11,6 +11,11 @@
         - Synchronization state evaluation over time
         - Channel overdrive statistics
     
+    Traces longer than "plot_max_points" are decimated with min/max bucketing
+    before plotting, this keeps the HTML files small while spikes like CPI 
+    gaps and overdrive events remain visible. The full resolution per frame
+    data is saved into the "Analysis_frame_data.npz" file.
+    
     The analyzation of the timestamp and the CPI index fields could reveal 
     potentail frame or data losses.
     
@@ -24,214 +29,373 @@
     The evaluation of the sample delay and the IQ synchronization states 
     over file indexes can also be analyzed.
     
+    Optionally the payload section of the frames can also be analyzed. In this
+    case the mean power, the DC offset, the peak magnitude, the clipping ratio
+    and the inter-channel power imbalance are calculated per channel and per 
+    frame. The frames are processed in chunks, so the memory usage does not 
+    depend on the length of the recording. The per frame statistics are saved
+    into the "Analysis_payload_stats.npz" file and frames exceeding the 
+    configured alarm thresholds are reported in the log.
+    
     In case the gain values of the receiver channels are not set properly, 
     overdrive may occour during the data acquisition. The corresponding Figure
     shows the evaluation of the overdrive detect flag per channel. 
         
     Usage:
     ------
-    To use the scripts specify the "fname_prefix", "start_index" and
-    "stop_index" values in the "P A R A M E T E R S" section.
+    To use the scripts specify the "meas_path" and "meas_id" values in the
+    "P A R A M E T E R S" section, or call the analysis through the command 
+    line interface:
+        python vega_cli.py analyze <iq_path> <res_path>
     
     
 
 """
 import numpy as np
 import logging
-from iq_record_tools.iq_header import IQHeader
-from iq_record_tools import iq_util
-from iq_record_tools.iq_util import path_leaf, sort_iq_frames
-
 import glob
-import sys
 from os.path import join 
 
-from plotly import graph_objects as go
-from plotly.offline import plot
-from plot_util.format import format_matplotlib
+def decimate_min_max(x, y, max_points):
+    """
+        Description: 
+        ------------
+        Reduces the number of points of a trace with min/max bucketing. The
+        trace is split into (max_points-4)/2 buckets and only the minimum and 
+        the maximum point of each bucket are kept in their original order, thus 
+        the spikes of the trace are preserved. The end points of the trace and
+        the minimum and maximum of the incomplete last bucket are also kept, so
+        the decimated trace has at most max_points points.
+        
+        NaN values are ignored when searching the minimum and the maximum of a 
+        bucket, a bucket containing only NaN values is represented by one NaN
+        point.
+        
+        Parameters:
+        -----------
+        :param: x         : X coordinates of the trace
+        :param: y         : Y coordinates of the trace
+        :param: max_points: Maximum number of points in the decimated trace,
+                            at least 6
+        
+        :type: x         : numpy array
+        :type: y         : numpy array
+        :type: max_points: int
+        
+        Return values:
+        --------------
+        :return: x_dec: Decimated x coordinates
+        :return: y_dec: Decimated y coordinates
+        
+        :rtype: x_dec: numpy array
+        :rtype: y_dec: numpy array
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) <= max_points:
+        return x, y
+    if max_points < 6:
+        raise ValueError("max_points must be at least 6, got {:d}".format(max_points))
+    
+    # NaN values are replaced so that they are never selected as minimum or maximum,
+    # unless the whole bucket is NaN
+    if np.issubdtype(y.dtype, np.floating):
+        y_min = np.where(np.isnan(y), np.inf, y)
+        y_max = np.where(np.isnan(y), -np.inf, y)
+    else:
+        y_min = y_max = y
+    
+    bucket_size = int(np.ceil(len(y) / ((max_points-4)//2)))
+    bucket_no   = len(y) // bucket_size
+    full_length = bucket_no*bucket_size
+    offsets     = np.arange(bucket_no)*bucket_size
+    
+    indexes = [np.array([0, len(y)-1]), # Keep the end points of the trace
+               offsets + np.argmin(y_min[0:full_length].reshape(bucket_no, bucket_size), axis=1), 
+               offsets + np.argmax(y_max[0:full_length].reshape(bucket_no, bucket_size), axis=1)]
+    if full_length < len(y): # Incomplete last bucket
+        indexes.append(full_length + np.array([np.argmin(y_min[full_length:]), np.argmax(y_max[full_length:])]))
+    indexes = np.unique(np.concatenate(indexes))
+    return x[indexes], y[indexes]
 
-#-------> P A R A M E T E R S <-------
-meas_path         = "MEASUREMENT PATH" 
-meas_id = 300
+def analyze_iq_frames(iq_path, res_path,
+                      en_time_stamp_analysis=True,
+                      en_cpi_index_analysis=True,
+                      en_sync_analysis=True,
+                      en_overdrive_analysis=True,
+                      en_frame_type_analysis=True,
+                      en_rx_gain_analysis=True,
+                      en_payload_analysis=False,
+                      payload_clip_level=1.0,
+                      payload_chunk_size=64,
+                      payload_max_workers=None,
+                      clipping_ratio_alarm=1e-3,
+                      power_imbalance_alarm=3,
+                      en_plot_decimation=True,
+                      plot_max_points=10000,
+                      header_chunk_size=4096):
+    """
+        Description: 
+        ------------
+        Analyzes the IQ frames of a measurement and saves the results into the 
+        result folder. The plotting and the IQ record tool packages are
+        imported only when the analysis is started.
+        
+        Parameters:
+        -----------
+        :param: iq_path : Folder of the ".iqf" IQ frames
+        :param: res_path: Folder where the figures and the log are saved
+        :param: en_*    : Enable or Disable different analyzes
+        :param: payload_clip_level   : Absolute I/Q value considered as clipped
+        :param: payload_chunk_size   : Number of frames loaded in one processing chunk
+        :param: payload_max_workers  : Number of worker threads, None: executor default
+        :param: clipping_ratio_alarm : Clipped sample ratio alarm threshold
+        :param: power_imbalance_alarm: Inter-channel power imbalance alarm threshold [dB]
+        :param: en_plot_decimation   : Decimate the traces longer than plot_max_points
+        :param: plot_max_points      : Maximum number of points per trace (at least 6)
+        :param: header_chunk_size    : Number of headers read and decoded at once
+        
+        :type: iq_path : string
+        :type: res_path: string
+        :type: en_*    : bool
+    """
+    from iq_header import IQHeader
+    from iq_record_tools.iq_util import path_leaf, sort_iq_frames
+    from IQRecordTools import read_header_block, read_headers, stream_payload_stats
+    from plotly import graph_objects as go
+    from plot_util.format import format_matplotlib
+    
+    iqf_files = glob.glob(join(iq_path,"*.iqf"))
+    
+    def scatter(x, y, **kwargs):
+        if en_plot_decimation:
+            x, y = decimate_min_max(x, y, plot_max_points)
+        return go.Scatter(x=x, y=y, **kwargs)
+    
+    # --- Initialize processing ---
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)
 
-iq_path            = join(join(meas_path,"{:04d}".format(meas_id), "iq"))
-res_path           = join(join(meas_path,"{:04d}".format(meas_id), "results"))
-iqf_files          = glob.glob(join(iq_path,"*.iqf"))
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
 
 
-# Enable or Disable different analyzes
-en_time_stamp_analysis  = True 
-en_cpi_index_analysis   = True
-en_sync_analysis        = True
-en_overdrive_analysis   = True
-en_frame_type_analysis  = True
-en_rx_gain_analysis     = True
-#-----------------------------------------------------------
+    sh = logging.StreamHandler()       
+    logger.addHandler(sh)
 
+    fh = logging.FileHandler(join(res_path, "IQ frame analysis.log"))
+    #fh.setFormatter(formatter)
+    logger.addHandler(fh)
 
+    iqf_files, ignore_list = sort_iq_frames(iqf_files, 
+                                        ignore_non_data_frames=True,
+                                        ignore_non_synced_frames=False)
+    logger.warning("Ignored IQ frames: {:d}".format(sum(ignore_list)))
+    iqf_files = [iqf_file for index, iqf_file in enumerate(iqf_files) if not ignore_list[index]]
+    logger.info(f"Available IQ frames {len(iqf_files)}")
+    if not len(iqf_files): return # Terminate running if no IQ frames are available after the selection
 
-"""
---- Initialize processing ---
-"""
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
 
-for handler in logger.handlers[:]:
-    logger.removeHandler(handler)
+    header_bytes, _, _ = read_header_block(iqf_files[0:1])
+    iq_header = IQHeader()
+    iq_header.decode_header(bytes(header_bytes))
+    iq_header.dump_header() 
+
+    M = iq_header.active_ant_chs
+
+    frame_no         = len(iqf_files)
+    file_indexes     = np.array([int(path_leaf(file_name).split('.')[0]) for file_name in iqf_files])
+    time_stamps      = np.zeros(frame_no, dtype=np.int64)
+    cpi_indexes      = np.zeros(frame_no, dtype=np.int64)
+    delay_sync_flags = np.zeros(frame_no, dtype=np.int64)
+    iq_sync_flags    = np.zeros(frame_no, dtype=np.int64)
+    overdrive_flags  = np.zeros([M, frame_no], dtype=np.int32)            
+    frame_types      = np.zeros(frame_no, dtype=np.int64)
+    rx_gains         = np.zeros([M, frame_no])
 
+    # --- P R O C E S S I N G ---
+    # The headers are read and decoded in chunks
+    for chunk_start in range(0, frame_no, header_chunk_size):
+        logger.info("Processing CPI: {:d}/{:d}".format(min(chunk_start+header_chunk_size, frame_no), frame_no))
+        iq_headers = read_headers(iqf_files[chunk_start:chunk_start+header_chunk_size])
+        chunk = slice(chunk_start, chunk_start+len(iq_headers))
+        
+        time_stamps[chunk]      = iq_headers["time_stamp"]
+        cpi_indexes[chunk]      = iq_headers["cpi_index"]
+        delay_sync_flags[chunk] = iq_headers["delay_sync_flag"]
+        iq_sync_flags[chunk]    = iq_headers["iq_sync_flag"]
+        frame_types[chunk]      = iq_headers["frame_type"]
+        
+        # Check overdrive
+        overdrive_flags[:, chunk] = (iq_headers["adc_overdrive_flags"][np.newaxis, :] >> np.arange(M, dtype=np.uint32)[:, np.newaxis]) & 1
+        rx_gains[:, chunk] = iq_headers["if_gains"][:, 0:M].T
     
-sh = logging.StreamHandler()       
-logger.addHandler(sh)
+    # Full resolution data for the decimated figures
+    np.savez(join(res_path, "Analysis_frame_data.npz"),
+             file_indexes     = file_indexes,
+             time_stamps      = time_stamps,
+             cpi_indexes      = cpi_indexes,
+             delay_sync_flags = delay_sync_flags,
+             iq_sync_flags    = iq_sync_flags,
+             frame_types      = frame_types,
+             overdrive_flags  = overdrive_flags,
+             rx_gains         = rx_gains)
 
-fh = logging.FileHandler(join(res_path, "IQ frame analysis.log"))
-#fh.setFormatter(formatter)
-logger.addHandler(fh)
+    if en_time_stamp_analysis:
+        # Figure 1: File index vs timestamps
+        fig_1 = go.Figure()
+        fig_1 = format_matplotlib(fig_1)
+        fig_1.add_trace(scatter(x=file_indexes, y=time_stamps))
+        fig_1.update_layout(xaxis=dict(title="File index"))
+        fig_1.update_layout(yaxis=dict(title="Timestamp"))
+        fig_1.write_html(join(res_path, "Analysis_timestamp.html"))
 
-iqf_files, ignore_list = sort_iq_frames(iqf_files, 
-                                    ignore_non_data_frames=True,
-                                    ignore_non_synced_frames=False)
-logger.warning("Ignored IQ frames: {:d}".format(sum(ignore_list)))
-iqf_files = [iqf_file for index, iqf_file in enumerate(iqf_files) if not ignore_list[index]]
-logger.info(f"Available IQ frames {len(iqf_files)}")
-if not len(iqf_files): sys.exit() # Terminate running if no IQ frames are available after the selection
+        # Figure 2: Timestamp differences between file indexes
+        fig_2 = go.Figure()
+        fig_2 = format_matplotlib(fig_2)
+        fig_2.add_trace(scatter(x=file_indexes[1:], y=np.diff(time_stamps)/1e6))
+        fig_2.update_layout(xaxis=dict(title="File index"))
+        fig_2.update_layout(yaxis=dict(title="Timestamp difference [ms]"))
+        fig_2.write_html(join(res_path, "Analysis_timestamp_diff.html"))
 
+    if en_cpi_index_analysis:
+        # Figure 3: File index vs cpi index
+        fig_3 = go.Figure()
+        fig_3 = format_matplotlib(fig_3)
+        fig_3.add_trace(scatter(x=np.arange(len(cpi_indexes)), y=cpi_indexes))
+        fig_3.update_layout(xaxis=dict(title="File index"))
+        fig_3.update_layout(yaxis=dict(title="CPI index"))
+        fig_3.write_html(join(res_path, "Analysis_cpi_indexes.html"))
 
-file_descr = open(iqf_files[0], "rb")
-iq_header_bytes = file_descr.read(1024)
-iq_header = IQHeader()
-iq_header.decode_header(iq_header_bytes)
-iq_header.dump_header() 
-file_descr.close()
+        # Figure 4: CPI index differences between file indexes
+        fig_4 = go.Figure()
+        fig_4 = format_matplotlib(fig_4)
+        fig_4.add_trace(scatter(x=file_indexes[1:], y=np.diff(cpi_indexes)))
+        fig_4.update_layout(xaxis=dict(title="File index"))
+        fig_4.update_layout(yaxis=dict(title="CPI index difference"))
+        fig_4.write_html(join(res_path, "Analysis_cpi_indexe_differences.html"))
 
-M = iq_header.active_ant_chs
+    if en_sync_analysis:
+        # Figure 5: IQ and delay sync flag vs file index
+        fig_5 = go.Figure()
+        fig_5 = format_matplotlib(fig_5)    
+        fig_5.add_trace(scatter(x=file_indexes, y=delay_sync_flags, name="Delay sync"))
+        fig_5.add_trace(scatter(x=file_indexes, y=iq_sync_flags, name="IQ sync"))
+        fig_5.update_layout(xaxis=dict(title="File index"))
+        fig_5.update_layout(yaxis=dict(title="Sync flags"))
+        fig_5.write_html(join(res_path, "Analysis_sync_flag.html"))
+        unique, counts = np.unique(delay_sync_flags, return_counts=True)
+        d = dict(zip(unique, counts))
+        try:
+            logging.info("Delay sync statistics [lost/total]:  [{:d}/{:d}]".format(d[0],d[0]+d[1]))
+        except KeyError:
+            pass
+            #logging.info("Delay sync statistics [lost/total]:  [{:d}/{:d}]".format(0,d[1]))
 
+    if en_overdrive_analysis:    
+         # Figure 6: Overdrive flags vs file index
+        fig_6 = go.Figure()
+        fig_6 = format_matplotlib(fig_6)
+        labels=[]
+        for m in range(M):
+            fig_6.add_trace(scatter(x=np.arange(len(iqf_files)), y=overdrive_flags[m,:], name="Channel:"+str(m)))            
+        fig_6.update_layout(xaxis=dict(title="File index"))
+        fig_6.update_layout(yaxis=dict(title="Overdrive flag"))
+        fig_6.write_html(join(res_path, "Analysis_overdrive.html"))
 
-time_stamps=[]
-cpi_indexes=[]
-delay_sync_flags=[]
-iq_sync_flags=[]
-overdrive_flags = np.zeros([M, len(iqf_files)], dtype=np.int32)            
-frame_types = []
-file_indexes = []
-rx_gains = np.empty([M,0])
+        # Figure 7: Number of overdrives per channel
+        #plt.figure(7)
+        #plt.bar(np.arange(M),np.sum(overdrive_flags, axis=1))
+        #plt.ylabel("Number of overdrives")
+        #plt.xlabel("Channel index")
 
-"""
----------------------
-P R O C E S S I N G
----------------------    
-"""
-for file_index, file_name in enumerate(iqf_files):
-    logger.info("Processing CPI: {:d}/{:d}".format(int(path_leaf(file_name).split('.')[0]), len(iqf_files)))
-    file_indexes.append(int(path_leaf(file_name).split('.')[0]))
+    if en_frame_type_analysis:
+        fig_8 = go.Figure()
+        fig_8 = format_matplotlib(fig_8)
+        fig_8.add_trace(scatter(x=file_indexes, y=frame_types))
+        fig_8.update_layout(xaxis=dict(title="File index"))
+        fig_8.update_layout(yaxis=dict(title="Frame types"))
+        fig_8.write_html(join(res_path, "Analysis_frame_types.html"))
+
+    if en_rx_gain_analysis:
+        fig_9 = go.Figure()
+        fig_9 = format_matplotlib(fig_9)
+        for m in range(M):
+            fig_9.add_trace(scatter(x=file_indexes, y=rx_gains[m,:]/10, name="Channel:"+str(m)))
+        fig_9.update_layout(xaxis=dict(title="File index"))
+        fig_9.update_layout(yaxis=dict(title="rx gains"))
+        fig_9.write_html(join(res_path, "Analysis_rx_gains.html"))
+
+    if en_payload_analysis:
+        logger.info("Analyzing payload sections")
+        payload_stats = stream_payload_stats(iqf_files, M, 
+                                             clip_level=payload_clip_level,
+                                             chunk_size=payload_chunk_size,
+                                             max_workers=payload_max_workers)
+        np.savez(join(res_path, "Analysis_payload_stats.npz"), file_indexes=file_indexes, **payload_stats)
+
+        # Figure 10: Mean power vs file index
+        fig_10 = go.Figure()
+        fig_10 = format_matplotlib(fig_10)
+        for m in range(M):
+            fig_10.add_trace(scatter(x=file_indexes, y=10*np.log10(payload_stats["mean_power"][m,:]), name="Channel:"+str(m)))
+        fig_10.update_layout(xaxis=dict(title="File index"))
+        fig_10.update_layout(yaxis=dict(title="Mean power [dB]"))
+        fig_10.write_html(join(res_path, "Analysis_payload_power.html"))
+
+        # Figure 11: DC offset and peak magnitude vs file index
+        fig_11 = go.Figure()
+        fig_11 = format_matplotlib(fig_11)
+        for m in range(M):
+            fig_11.add_trace(scatter(x=file_indexes, y=payload_stats["dc_offset"][m,:], name="DC offset Channel:"+str(m)))
+            fig_11.add_trace(scatter(x=file_indexes, y=payload_stats["peak_magnitude"][m,:], name="Peak Channel:"+str(m)))
+        fig_11.update_layout(xaxis=dict(title="File index"))
+        fig_11.update_layout(yaxis=dict(title="Magnitude"))
+        fig_11.write_html(join(res_path, "Analysis_payload_levels.html"))
+
+        # Figure 12: Clipping ratio vs file index
+        fig_12 = go.Figure()
+        fig_12 = format_matplotlib(fig_12)
+        for m in range(M):
+            fig_12.add_trace(scatter(x=file_indexes, y=payload_stats["clipping_ratio"][m,:], name="Channel:"+str(m)))
+        fig_12.update_layout(xaxis=dict(title="File index"))
+        fig_12.update_layout(yaxis=dict(title="Clipping ratio"))
+        fig_12.write_html(join(res_path, "Analysis_payload_clipping.html"))
+
+        # Figure 13: Inter-channel power imbalance vs file index
+        fig_13 = go.Figure()
+        fig_13 = format_matplotlib(fig_13)
+        for m in range(M):
+            fig_13.add_trace(scatter(x=file_indexes, y=payload_stats["power_imbalance"][m,:], name="Channel:"+str(m)))
+        fig_13.update_layout(xaxis=dict(title="File index"))
+        fig_13.update_layout(yaxis=dict(title="Power imbalance [dB]"))
+        fig_13.write_html(join(res_path, "Analysis_payload_imbalance.html"))
+
+        # Threshold alarms
+        for m in range(M):
+            clipping_alarms = file_indexes[payload_stats["clipping_ratio"][m,:] > clipping_ratio_alarm]
+            imbalance_alarms = file_indexes[np.abs(payload_stats["power_imbalance"][m,:]) > power_imbalance_alarm]
+            if len(clipping_alarms):
+                logger.warning("Channel {:d}: Clipping ratio exceeds {:.2e} in {:d} frames, first at file index {:d}".format(m, clipping_ratio_alarm, len(clipping_alarms), clipping_alarms[0]))
+            if len(imbalance_alarms):
+                logger.warning("Channel {:d}: Power imbalance exceeds {:.1f} dB in {:d} frames, first at file index {:d}".format(m, power_imbalance_alarm, len(imbalance_alarms), imbalance_alarms[0]))
+
+
+if __name__ == "__main__":
+    #-------> P A R A M E T E R S <-------
+    meas_path         = "MEASUREMENT PATH" 
+    meas_id = 300
     
+    iq_path            = join(join(meas_path,"{:04d}".format(meas_id), "iq"))
+    res_path           = join(join(meas_path,"{:04d}".format(meas_id), "results"))
+    #-----------------------------------------------------------
     
-    file_descr = open(file_name, "rb")
-    iq_header_bytes = file_descr.read(1024)
-    iq_header = IQHeader()
-    iq_header.decode_header(iq_header_bytes)
-    #iq_header.dump_header() # Enable this to see the IQ header content during conversion      
-            
-    file_descr.close()
-    time_stamps.append(iq_header.time_stamp)
-    cpi_indexes.append(iq_header.cpi_index)
-    delay_sync_flags.append(iq_header.delay_sync_flag)
-    iq_sync_flags.append(iq_header.iq_sync_flag)
-    frame_types.append(iq_header.frame_type)
-    
-    # Check overdrive
-    for m in range(M):               
-        if iq_header.adc_overdrive_flags & 1<<m:        
-            overdrive_flags[m, file_index] = 1     
-    rx_gains = np.append(rx_gains, np.array(iq_header.if_gains[0:M]).reshape([M,1]), axis=1)    
-        
-file_indexes     = np.array(file_indexes)    
-time_stamps      = np.array(time_stamps)
-cpi_indexes      = np.array(cpi_indexes)
-delay_sync_flags = np.array(delay_sync_flags)
-iq_sync_flags    = np.array(iq_sync_flags)
-frame_types      = np.array(frame_types)
-
-if en_time_stamp_analysis:
-    # Figure 1: File index vs timestamps
-    fig_1 = go.Figure()
-    fig_1 = format_matplotlib(fig_1)
-    fig_1.add_trace(go.Scatter(x=file_indexes, y=time_stamps))
-    fig_1.update_layout(xaxis=dict(title="File index"))
-    fig_1.update_layout(yaxis=dict(title="Timestamp"))
-    fig_1.write_html(join(res_path, "Analysis_timestamp.html"))
-    
-    # Figure 2: Timestamp differences between file indexes
-    fig_2 = go.Figure()
-    fig_2 = format_matplotlib(fig_2)
-    fig_2.add_trace(go.Scatter(x=file_indexes, y=np.diff(time_stamps)/1e6))
-    fig_2.update_layout(xaxis=dict(title="File index"))
-    fig_2.update_layout(yaxis=dict(title="Timestamp difference [ms]"))
-    fig_2.write_html(join(res_path, "Analysis_timestamp_diff.html"))
-
-if en_cpi_index_analysis:
-    # Figure 3: File index vs cpi index
-    fig_3 = go.Figure()
-    fig_3 = format_matplotlib(fig_3)
-    fig_3.add_trace(go.Scatter(y=cpi_indexes))
-    fig_3.update_layout(xaxis=dict(title="File index"))
-    fig_3.update_layout(yaxis=dict(title="CPI index"))
-    fig_3.write_html(join(res_path, "Analysis_cpi_indexes.html"))
-    
-    # Figure 4: CPI index differences between file indexes
-    fig_4 = go.Figure()
-    fig_4 = format_matplotlib(fig_4)
-    fig_4.add_trace(go.Scatter(x=file_indexes, y=np.diff(cpi_indexes)))
-    fig_4.update_layout(xaxis=dict(title="File index"))
-    fig_4.update_layout(yaxis=dict(title="CPI index difference"))
-    fig_4.write_html(join(res_path, "Analysis_cpi_indexe_differences.html"))
-
-if en_sync_analysis:
-    # Figure 5: IQ and delay sync flag vs file index
-    fig_5 = go.Figure()
-    fig_5 = format_matplotlib(fig_5)    
-    fig_5.add_trace(go.Scatter(x=file_indexes, y=delay_sync_flags, name="Delay sync"))
-    fig_5.add_trace(go.Scatter(x=file_indexes, y=iq_sync_flags, name="IQ sync"))
-    fig_5.update_layout(xaxis=dict(title="File index"))
-    fig_5.update_layout(yaxis=dict(title="Sync flags"))
-    fig_5.write_html(join(res_path, "Analysis_sync_flag.html"))
-    unique, counts = np.unique(delay_sync_flags, return_counts=True)
-    d = dict(zip(unique, counts))
-    try:
-        logging.info("Delay sync statistics [lost/total]:  [{:d}/{:d}]".format(d[0],d[0]+d[1]))
-    except KeyError:
-        pass
-        #logging.info("Delay sync statistics [lost/total]:  [{:d}/{:d}]".format(0,d[1]))
-
-if en_overdrive_analysis:    
-     # Figure 6: Overdrive flags vs file index
-    fig_6 = go.Figure()
-    fig_6 = format_matplotlib(fig_6)
-    labels=[]
-    for m in range(M):
-        fig_6.add_trace(go.Scatter(y=overdrive_flags[m,:], name="Channel:"+str(m)))            
-    fig_6.update_layout(xaxis=dict(title="File index"))
-    fig_6.update_layout(yaxis=dict(title="Overdrive flag"))
-    fig_6.write_html(join(res_path, "Analysis_overdrive.html"))
-
-    # Figure 7: Number of overdrives per channel
-    #plt.figure(7)
-    #plt.bar(np.arange(M),np.sum(overdrive_flags, axis=1))
-    #plt.ylabel("Number of overdrives")
-    #plt.xlabel("Channel index")
-
-if en_frame_type_analysis:
-    fig_8 = go.Figure()
-    fig_8 = format_matplotlib(fig_8)
-    fig_8.add_trace(go.Scatter(x=file_indexes, y=frame_types))
-    fig_8.update_layout(xaxis=dict(title="File index"))
-    fig_8.update_layout(yaxis=dict(title="Frame types"))
-    fig_8.write_html(join(res_path, "Analysis_frame_types.html"))
-
-if en_rx_gain_analysis:
-    fig_9 = go.Figure()
-    fig_9 = format_matplotlib(fig_9)
-    for m in range(M):
-        fig_9.add_trace(go.Scatter(x=file_indexes, y=rx_gains[m,:]/10, name="Channel:"+str(m)))
-    fig_9.update_layout(xaxis=dict(title="File index"))
-    fig_9.update_layout(yaxis=dict(title="rx gains"))
-    fig_9.write_html(join(res_path, "Analysis_rx_gains.html"))
+    analyze_iq_frames(iq_path, res_path,
+                      # Enable or Disable different analyzes
+                      en_time_stamp_analysis  = True,
+                      en_cpi_index_analysis   = True,
+                      en_sync_analysis        = True,
+                      en_overdrive_analysis   = True,
+                      en_frame_type_analysis  = True,
+                      en_rx_gain_analysis     = True,
+                      en_payload_analysis     = False)
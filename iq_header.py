@@ -17,6 +17,8 @@ class IQHeader():
     FRAME_TYPE_TRIGW = 4
     
     SYNC_WORD = 0x2bf7b95a
+    
+    KNOWN_HEADER_VERSIONS = (7,)
 
     def __init__(self):
         
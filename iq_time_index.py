@@ -0,0 +1,135 @@
+import numpy as np
+import logging
+import glob
+import os
+from iq_header import IQHeader
+from IQRecordTools import IQ_HEADER_DTYPE, get_frame_index, load_iq, read_header_block, decode_headers
+"""
+    Description: Time stamp index of the IQ frames of a measurement
+
+    The index reads the headers of all the IQ frames in a measurement folder
+    once and keeps only the sorted time stamps, CPI indexes and file names in
+    memory. Time range and nearest
+    time stamp queries are answered with binary search on this sorted array.
+
+    The time stamp resolution can be coarse (one second in RTL-SDR based DAQ
+    systems), thus several frames may share the same time stamp. These frames
+    are ordered by their CPI index and then by the index in their file name,
+    so the index is in acquisition order. Queries hitting such a group of 
+    frames return the first frame of the group.
+
+    Indexes are cached per folder, a cached index is reused as long as the
+    modification time of the folder does not change.
+
+    Usage:
+    ------
+        time_index = IQTimeIndex.get(iq_path)
+        iqf_files  = time_index.query_range(t0, t1)
+        for iq_samples, iq_header in time_index.load_range(t0, t1):
+            ...
+
+    Project: VEGA database tools
+"""
+class IQTimeIndex():
+
+    _cache = {}
+
+    def __init__(self, iq_path, data_frames_only=True):
+        """
+            Builds the index from the ".iqf" files of the given folder
+
+            Parameters:
+            -----------
+            :param: iq_path         : Folder of the IQ frames
+            :param: data_frames_only: Index only the data type frames
+
+            :type: iq_path         : string
+            :type: data_frames_only: bool
+        """
+        self.logger = logging.getLogger(__name__)
+        self.iq_path = os.path.abspath(iq_path)
+        self.data_frames_only = data_frames_only
+        self.folder_mtime = os.stat(self.iq_path).st_mtime_ns
+
+        file_names = glob.glob(os.path.join(self.iq_path, "*.iqf"))
+        header_bytes, read_lengths, _ = read_header_block(file_names)
+        iq_headers = decode_headers(header_bytes)
+        selected = read_lengths == IQ_HEADER_DTYPE.itemsize
+        if not np.all(selected):
+            self.logger.warning("Frames with incomplete header are not indexed: {:d}".format(int(np.sum(~selected))))
+        if data_frames_only:
+            selected &= iq_headers["frame_type"] == IQHeader.FRAME_TYPE_DATA
+        iq_headers = iq_headers[selected]
+        file_names = [file_name for file_name, select in zip(file_names, selected) if select]
+
+        # Acquisition order: time stamp, CPI index, file index
+        file_indexes = np.array([get_frame_index(file_name) for file_name in file_names], dtype=np.int64)
+        order = np.lexsort((file_indexes, iq_headers["cpi_index"], iq_headers["time_stamp"]))
+        # Only the fields needed by the queries are kept, the header buffer is released
+        self.time_stamps = iq_headers["time_stamp"][order]
+        self.cpi_indexes = iq_headers["cpi_index"][order]
+        self.file_names  = [file_names[i] for i in order]
+        self.logger.debug("Time index built for {:s}, {:d} frames".format(self.iq_path, len(self.file_names)))
+
+    @classmethod
+    def get(cls, iq_path, data_frames_only=True):
+        """
+            Returns the cached index of the folder or builds a new one in case
+            it is not available or the content of the folder has changed.
+        """
+        key = (os.path.abspath(iq_path), data_frames_only)
+        time_index = cls._cache.get(key)
+        if time_index is None or time_index.folder_mtime != os.stat(key[0]).st_mtime_ns:
+            time_index = cls(iq_path, data_frames_only)
+            cls._cache[key] = time_index
+        return time_index
+
+    def __len__(self):
+        return len(self.file_names)
+
+    @property
+    def first_time_stamp(self):
+        return int(self.time_stamps[0])
+
+    @property
+    def last_time_stamp(self):
+        return int(self.time_stamps[-1])
+
+    def range_slice(self, t0, t1):
+        """
+            Returns the index slice of the frames with t0 <= time stamp <= t1
+        """
+        start = np.searchsorted(self.time_stamps, t0, side="left")
+        stop  = np.searchsorted(self.time_stamps, t1, side="right")
+        return slice(int(start), int(max(start, stop)))
+
+    def query_range(self, t0, t1):
+        """
+            Returns the file names of the frames with t0 <= time stamp <= t1
+            in time stamp order.
+        """
+        return self.file_names[self.range_slice(t0, t1)]
+
+    def load_range(self, t0, t1):
+        """
+            Generator, that loads the frames with t0 <= time stamp <= t1 one
+            by one in time stamp order. Yields (iq_samples, iq_header) tuples
+            as load_iq.
+        """
+        for file_name in self.query_range(t0, t1):
+            yield load_iq(file_name)
+
+    def nearest(self, t):
+        """
+            Returns the file name and the time stamp of the frame, whose time
+            stamp is the closest to t. In case more frames have this time stamp
+            the first one is returned, equally distant earlier frames are 
+            preferred.
+        """
+        if not len(self.file_names):
+            return None, None
+        i = int(np.searchsorted(self.time_stamps, t))
+        if i == len(self.time_stamps) or (i > 0 and t - self.time_stamps[i-1] <= self.time_stamps[i] - t):
+            # First frame of the previous time stamp group
+            i = int(np.searchsorted(self.time_stamps, self.time_stamps[i-1], side="left"))
+        return self.file_names[i], int(self.time_stamps[i])
@@ -0,0 +1,116 @@
+import numpy as np
+import logging
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+from iq_header import IQHeader
+from IQRecordTools import IQ_HEADER_DTYPE, get_frame_index, read_header_block, decode_headers
+"""
+    Description: Integrity verification of the IQ frames of a measurement
+
+    The following checks are performed on every ".iqf" file:
+        - The file contains a complete header
+        - The sync word of the header is valid
+        - The header version is known
+        - The file size equals to the header size plus the payload size
+          implied by the "cpi_length", "active_ant_chs" and "sample_bit_depth"
+          header fields
+        - The header fields describing the recording configuration are 
+          consistent with the first frame of the measurement
+
+    Only the headers are read from the files and the file sizes are 
+    obtained with stat, the files are processed concurrently in chunks.
+
+    Project: VEGA database tools
+"""
+
+# Header fields that must not change within a measurement
+CONSISTENT_FIELDS = ("hardware_id", "unit_id", "active_ant_chs", "ioo_type", "rf_center_freq",
+                     "sampling_freq", "cpi_length", "data_type", "sample_bit_depth", "header_version")
+
+def verify_measurement(iq_path, known_header_versions=IQHeader.KNOWN_HEADER_VERSIONS, max_workers=None, chunk_size=256):
+    """
+        Description: 
+        ------------
+        Verifies the integrity of all the IQ frames in a measurement folder.
+        
+        Parameters:
+        -----------
+        :param: iq_path              : Folder of the ".iqf" IQ frames
+        :param: known_header_versions: Accepted header version values
+        :param: max_workers          : Number of worker threads (None: executor default)
+        :param: chunk_size           : Number of headers read by a worker at once
+        
+        :type: iq_path              : string
+        :type: known_header_versions: tuple of ints
+        :type: max_workers          : int
+        :type: chunk_size           : int
+        
+        Return values:
+        --------------
+        :return: report: JSON serializable verification report. The "frames" 
+                         list contains only the frames that failed at least 
+                         one check, with the list of the failed checks.
+        :rtype: report : dict
+    """
+    header_size = IQ_HEADER_DTYPE.itemsize
+    file_names = sorted(glob.glob(os.path.join(iq_path, "*.iqf")), key=lambda file_name: (get_frame_index(file_name), file_name))
+    frame_no = len(file_names)
+    
+    file_sizes = np.zeros(frame_no, dtype=np.int64)
+    header_bytes = bytearray(frame_no*header_size)
+    complete = np.zeros(frame_no, dtype=bool)
+    chunk_starts = range(0, frame_no, chunk_size)
+    
+    def _read_chunk(chunk_start):
+        # The workers read directly into disjoint slots of the shared header buffer
+        return read_header_block(file_names[chunk_start:chunk_start+chunk_size], out=header_bytes, offset=chunk_start)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_start, (_, read_lengths, chunk_file_sizes) in zip(chunk_starts, executor.map(_read_chunk, chunk_starts)):
+            chunk = slice(chunk_start, chunk_start+len(read_lengths))
+            file_sizes[chunk] = chunk_file_sizes
+            complete[chunk] = read_lengths == header_size
+    iq_headers = decode_headers(header_bytes)
+    
+    frame_errors = [[] for i in range(frame_no)]
+    for i in np.flatnonzero(~complete):
+        frame_errors[i].append(dict(check="header_size", file_size=int(file_sizes[i])))
+    
+    for i in np.flatnonzero(complete & (iq_headers["sync_word"] != IQHeader.SYNC_WORD)):
+        frame_errors[i].append(dict(check="sync_word", value=int(iq_headers["sync_word"][i])))
+    valid = complete & (iq_headers["sync_word"] == IQHeader.SYNC_WORD)
+    
+    for i in np.flatnonzero(valid & ~np.isin(iq_headers["header_version"], known_header_versions)):
+        frame_errors[i].append(dict(check="header_version", value=int(iq_headers["header_version"][i])))
+    
+    payload_sizes = (iq_headers["cpi_length"].astype(np.int64) * iq_headers["active_ant_chs"] * 
+                     2 * iq_headers["sample_bit_depth"]) // 8
+    expected_sizes = header_size + payload_sizes
+    for i in np.flatnonzero(valid & (file_sizes != expected_sizes)):
+        frame_errors[i].append(dict(check="file_size", expected=int(expected_sizes[i]), actual=int(file_sizes[i])))
+    
+    reference = None
+    if np.any(valid):
+        ref_index = int(np.flatnonzero(valid)[0])
+        reference = dict(file=file_names[ref_index])
+        inconsistent = np.zeros(frame_no, dtype=bool)
+        field_mismatch = {}
+        for field in CONSISTENT_FIELDS:
+            reference[field] = iq_headers[field][ref_index].item()
+            field_mismatch[field] = valid & (iq_headers[field] != iq_headers[field][ref_index])
+            inconsistent |= field_mismatch[field]
+        for i in np.flatnonzero(inconsistent):
+            fields = [field for field in CONSISTENT_FIELDS if field_mismatch[field][i]]
+            frame_errors[i].append(dict(check="consistency", fields=fields))
+        reference["hardware_id"] = reference["hardware_id"].decode(errors="replace")
+    
+    failed_frames = [dict(file=file_names[i], errors=frame_errors[i]) for i in range(frame_no) if frame_errors[i]]
+    report = dict(iq_path=iq_path,
+                  frame_count=frame_no,
+                  failed_frame_count=len(failed_frames),
+                  passed=bool(frame_no) and not failed_frames,
+                  reference=reference,
+                  frames=failed_frames)
+    logging.info("Verified {:d} frames, {:d} failed".format(frame_no, len(failed_frames)))
+    return report
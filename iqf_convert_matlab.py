@@ -4,63 +4,171 @@
     The converted MATLAB data file contains both the IQ header and the 
     multichannel IQ data sections.
     
+    The conversion can also be started from the command line interface:
+        python vega_cli.py convert-matlab <fname_prefix> <start_index> <stop_index>
+    
+    Whole measurements can be exported into a single MATLAB v7.3 (HDF5 based)
+    file with the export_measurement_mat73 function. The frames are streamed
+    into the file in chunks, thus the memory usage does not depend on the 
+    size of the recording. This export requires the h5py package.
+        python vega_cli.py export-mat73 <iq_path> <output_file>
+    
 """
 import numpy as np
-import scipy.io as io
 import logging
-from iq_header import IQHeader
+import time
+import platform
+from IQRecordTools import load_iq, read_headers
 
+# Header fields exported as column vectors by export_measurement_mat73
+MAT73_HEADER_FIELDS = ("header_version", "frame_type", "unit_id", "active_ant_chs", "ioo_type",
+                       "rf_center_freq", "adc_sampling_freq", "sampling_freq", "cpi_length",
+                       "time_stamp", "daq_block_index", "cpi_index", "ext_integration_cntr",
+                       "data_type", "sample_bit_depth", "adc_overdrive_flags", "delay_sync_flag",
+                       "iq_sync_flag", "sync_state", "noise_source_state")
 
-#-------> C O N V E R S I O N   P A R A M E T E R S <-------
-fname_prefix = "VEGAM20191219K4C0S9_" # Filename without the counter value
-start_index = 758 
-stop_index = 758
-#-----------------------------------------------------------
+def convert_iqf_to_mat(fname_prefix, start_index, stop_index, dump_header=True):
+    """
+        Converts the "<fname_prefix><index>.iqf" IQ frames to 
+        "<fname_prefix><index>.mat" files in the [start_index, stop_index] 
+        index range.
+    """
+    import scipy.io as io
+    for i in np.arange(start_index,stop_index+1,1):
+        file_name = (fname_prefix+str(i)+".iqf")
+        print("Converting: {:s}".format(file_name))    
 
-logging.basicConfig(level=logging.INFO)
-for i in np.arange(start_index,stop_index+1,1):
-    file_name = (fname_prefix+str(i)+".iqf")
-    print("Converting: {:s}".format(file_name))    
-    
-    file_descr = open(file_name, "rb")
-    iq_header_bytes = file_descr.read(1024)
-    iq_header = IQHeader()
-    iq_header.decode_header(iq_header_bytes)
-    iq_header.dump_header() # Enable this to see the IQ header content during conversion      
-    
-    iq_data_length = int((iq_header.cpi_length * iq_header.active_ant_chs * (2*iq_header.sample_bit_depth))/8)
-    iq_data_bytes = file_descr.read(iq_data_length)
+        iq_cf64, iq_header = load_iq(file_name)
+        if dump_header:
+            iq_header.dump_header() # Enable this to see the IQ header content during conversion
+
+        matlab_data= dict(header_version       = iq_header.header_version,
+                          frame_type           = iq_header.frame_type,           
+                          hardware_id          = iq_header.hardware_id,         
+                          unit_id              = iq_header.unit_id,
+                          active_ant_chs       = iq_header.active_ant_chs,
+                          ioo_type             = iq_header.ioo_type,             
+                          rf_center_freq       = iq_header.rf_center_freq,       
+                          adc_sampling_freq    = iq_header.adc_sampling_freq,    
+                          sampling_freq        = iq_header.sampling_freq,
+                          cpi_length           = iq_header.cpi_length,           
+                          time_stamp           = iq_header.time_stamp,           
+                          cpi_index            = iq_header.cpi_index,            
+                          ext_integration_cntr = iq_header.ext_integration_cntr, 
+                          data_type            = iq_header.data_type,            
+                          sample_bit_depth     = iq_header.sample_bit_depth,     
+                          adc_overdrive_flags  = iq_header.adc_overdrive_flags,                           
+                          delay_sync_flag      = iq_header.delay_sync_flag,  
+                          iq_sync_flag         = iq_header.iq_sync_flag,  
+                          sync_state           = iq_header.sync_state,  
+                          noise_source_state   = iq_header.noise_source_state,     
+                          iq_data              = iq_cf64)
+        for m in range(32):
+            matlab_data['if_gain_{:02.0f}'.format(m)] = iq_header.if_gains[m]
+
+        io.savemat((fname_prefix+str(i)+".mat"),matlab_data) # Save to matlab file
+
+def _write_mat73_userblock(file_name):
+    """
+        Writes the MATLAB 7.3 MAT-file header into the 512 byte user block
+        of an HDF5 file
+    """
+    header_text = "MATLAB 7.3 MAT-file, Platform: {:s}, Created on: {:s} HDF5 schema 1.00 .".format(
+                  platform.system(), time.strftime("%a %b %d %H:%M:%S %Y"))
+    header = header_text.encode().ljust(116, b" ")[0:116] + bytes(8) + b"\x00\x02IM"
+    with open(file_name, "r+b") as file_descr:
+        file_descr.write(header)
+
+def export_measurement_mat73(iqf_files, output_file, chunk_size=16):
+    """
+        Description: 
+        ------------
+        Exports IQ frames into a single MATLAB v7.3 compatible (HDF5 based)
+        file. The frames are loaded and appended to the file chunk by chunk.
         
-    file_descr.close()
-              
-    iq_cf64 = np.frombuffer(iq_data_bytes, dtype=np.complex64).reshape(iq_header.active_ant_chs,
-                                                                       iq_header.cpi_length)
-    
-    matlab_data= dict(header_version       = iq_header.header_version,
-                      frame_type           = iq_header.frame_type,           
-                      hardware_id          = iq_header.hardware_id,         
-                      unit_id              = iq_header.unit_id,
-                      active_ant_chs       = iq_header.active_ant_chs,
-                      ioo_type             = iq_header.ioo_type,             
-                      rf_center_freq       = iq_header.rf_center_freq,       
-                      adc_sampling_freq    = iq_header.adc_sampling_freq,    
-                      sampling_freq        = iq_header.sampling_freq,
-                      cpi_length           = iq_header.cpi_length,           
-                      time_stamp           = iq_header.time_stamp,           
-                      cpi_index            = iq_header.cpi_index,            
-                      ext_integration_cntr = iq_header.ext_integration_cntr, 
-                      data_type            = iq_header.data_type,            
-                      sample_bit_depth     = iq_header.sample_bit_depth,     
-                      adc_overdrive_flags  = iq_header.adc_overdrive_flags,                           
-                      delay_sync_flag      = iq_header.delay_sync_flag,  
-                      iq_sync_flag         = iq_header.iq_sync_flag,  
-                      sync_state           = iq_header.sync_state,  
-                      noise_source_state   = iq_header.noise_source_state,     
-                      iq_data              = iq_cf64)
-    for m in range(32):
-        matlab_data['if_gain_{:02.0f}'.format(m)] = iq_header.if_gains[m]
+        File content:
+            - iq_data    : single complex array, (frames, channels, samples) in 
+                           HDF5 order, which appears as samples x channels x frames
+                           in MATLAB
+            - <field>    : Header fields listed in MAT73_HEADER_FIELDS, one value 
+                           per frame (column vectors in MATLAB)
+            - if_gains   : IF gains of the 32 channels per frame (frames x 32 in MATLAB)
+            - hardware_id: Hardware ID of the first frame
+        
+        All the frames must have the same channel number and CPI length. The
+        frames are written in the given order, a warning is logged in case
+        the CPI index decreases between consecutive frames.
+        
+        Parameters:
+        -----------
+        :param: iqf_files  : IQ frame file names in acquisition order
+        :param: output_file: Name of the exported ".mat" file
+        :param: chunk_size : Number of frames loaded and written at once
+        
+        :type: iqf_files  : list of strings
+        :type: output_file: string
+        :type: chunk_size : int
+    """
+    import h5py
     
-    io.savemat((fname_prefix+str(i)+".mat"),matlab_data) # Save to matlab file
+    if not len(iqf_files):
+        raise ValueError("No IQ frames to export")
+    first_header = read_headers(iqf_files[0:1])[0]
+    M = int(first_header["active_ant_chs"])
+    N = int(first_header["cpi_length"])
+    complex_dtype = np.dtype([("real", "<f4"), ("imag", "<f4")])
     
+    with h5py.File(output_file, "w", userblock_size=512, libver="earliest") as mat_file:
+        iq_data = mat_file.create_dataset("iq_data", shape=(0, M, N), maxshape=(None, M, N),
+                                          chunks=(1, M, N), dtype=complex_dtype)
+        iq_data.attrs["MATLAB_class"] = np.bytes_("single")
+        
+        header_datasets = {}
+        for field in MAT73_HEADER_FIELDS + ("if_gains",):
+            field_dtype = first_header.dtype[field].base
+            rows = 32 if field == "if_gains" else 1
+            header_datasets[field] = mat_file.create_dataset(field, shape=(rows, 0), maxshape=(rows, None),
+                                                             chunks=(rows, 1024), dtype=field_dtype)
+            header_datasets[field].attrs["MATLAB_class"] = np.bytes_(field_dtype.name)
+        
+        hardware_id = np.frombuffer(first_header["hardware_id"], dtype=np.uint8).astype(np.uint16)
+        mat_file.create_dataset("hardware_id", data=hardware_id.reshape(-1, 1))
+        mat_file["hardware_id"].attrs["MATLAB_class"] = np.bytes_("char")
+        
+        iq_chunk = np.empty([chunk_size, M, N], dtype=np.complex64)
+        last_cpi_index = -1
+        for chunk_start in range(0, len(iqf_files), chunk_size):
+            chunk_files = iqf_files[chunk_start:chunk_start+chunk_size]
+            logging.info("Exporting: {:d}/{:d}".format(chunk_start+len(chunk_files), len(iqf_files)))
+            iq_headers = read_headers(chunk_files)
+            if np.any(iq_headers["active_ant_chs"] != M) or np.any(iq_headers["cpi_length"] != N):
+                raise ValueError("Inconsistent frame dimensions in chunk starting with {:s}".format(chunk_files[0]))
+            
+            # Check the frame order, the frames are expected to be consecutive CPIs
+            cpi_indexes = iq_headers["cpi_index"].astype(np.int64)
+            if np.any(np.diff(np.concatenate([[last_cpi_index], cpi_indexes])) < 0):
+                logging.warning("CPI index decreases in chunk starting with {:s}, frames are not in acquisition order".format(chunk_files[0]))
+            last_cpi_index = cpi_indexes[-1]
+            
+            for i, file_name in enumerate(chunk_files):
+                iq_chunk[i] = np.fromfile(file_name, dtype=np.complex64, count=M*N, offset=1024).reshape(M, N)
+            
+            frame_no = len(chunk_files)
+            iq_data.resize(chunk_start+frame_no, axis=0)
+            iq_data[chunk_start:chunk_start+frame_no] = iq_chunk[0:frame_no].view(complex_dtype).reshape(frame_no, M, N)
+            for field, dataset in header_datasets.items():
+                dataset.resize(chunk_start+frame_no, axis=1)
+                dataset[:, chunk_start:chunk_start+frame_no] = iq_headers[field].reshape(frame_no, -1).T
     
+    _write_mat73_userblock(output_file)
+
+
+if __name__ == "__main__":
+    #-------> C O N V E R S I O N   P A R A M E T E R S <-------
+    fname_prefix = "VEGAM20191219K4C0S9_" # Filename without the counter value
+    start_index = 758 
+    stop_index = 758
+    #-----------------------------------------------------------
     
+    logging.basicConfig(level=logging.INFO)
+    convert_iqf_to_mat(fname_prefix, start_index, stop_index)
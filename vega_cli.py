@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    Command line interface of the VEGA database tools.
+    
+    Available subcommands:
+        - analyze       : IQ frame analysis of a measurement (iq_frame_analyzer.py)
+        - convert-matlab: Converts IQ frames to MATLAB ".mat" files (iqf_convert_matlab.py)
+        - export-mat73  : Exports a whole measurement into a single MATLAB v7.3
+                          file (iqf_convert_matlab.py)
+        - fr24-preproc  : Generates target reference tracks from FlightRadar24 
+                          data (FR24_track_preproc.py)
+        - fr24-batch    : Generates target reference tracks for multiple measurements
+                          from a shared set of FlightRadar24 data (FR24_track_preproc.py)
+        - info          : Prints the header content of IQ frames
+        - verify        : Verifies the integrity of the IQ frames of a measurement
+                          (iq_verify.py)
+    
+    The heavy dependencies (numpy, scipy, plotly, APRiL) are imported only by
+    the subcommand that needs them, so short calls like "info" start quickly.
+    
+    Usage:
+    ------
+        python vega_cli.py <subcommand> -h
+"""
+import argparse
+import logging
+import sys
+
+def cmd_analyze(args):
+    from iq_frame_analyzer import analyze_iq_frames
+    analyze_iq_frames(args.iq_path, args.res_path,
+                      en_time_stamp_analysis = not args.no_time_stamp,
+                      en_cpi_index_analysis  = not args.no_cpi_index,
+                      en_sync_analysis       = not args.no_sync,
+                      en_overdrive_analysis  = not args.no_overdrive,
+                      en_frame_type_analysis = not args.no_frame_type,
+                      en_rx_gain_analysis    = not args.no_rx_gain,
+                      en_payload_analysis    = args.payload,
+                      payload_clip_level     = args.clip_level,
+                      payload_chunk_size     = args.chunk_size,
+                      payload_max_workers    = args.workers,
+                      clipping_ratio_alarm   = args.clipping_alarm,
+                      power_imbalance_alarm  = args.imbalance_alarm,
+                      en_plot_decimation     = not args.no_decimation,
+                      plot_max_points        = args.max_points)
+
+def cmd_convert_matlab(args):
+    from iqf_convert_matlab import convert_iqf_to_mat
+    convert_iqf_to_mat(args.fname_prefix, args.start_index, args.stop_index,
+                       dump_header=args.dump_header)
+
+def cmd_export_mat73(args):
+    from iqf_convert_matlab import export_measurement_mat73
+    from iq_time_index import IQTimeIndex
+    # The index orders the frames by time stamp, CPI index and file index
+    time_index = IQTimeIndex.get(args.iq_path, data_frames_only=not args.all_frames)
+    export_measurement_mat73(time_index.file_names, args.output_file, chunk_size=args.chunk_size)
+
+def cmd_fr24_preproc(args):
+    from FR24_track_preproc import generate_target_ref_tracks
+    radar_lat, radar_lon, radar_ele, radar_bearing = args.radar
+    ioo_lat, ioo_lon, ioo_ele = args.ioo
+    generate_target_ref_tracks(args.vega_measurement_path, args.center_freq,
+                               radar_lat, radar_lon, radar_ele, radar_bearing,
+                               ioo_lat, ioo_lon, ioo_ele,
+                               max_bistatic_range=args.max_range,
+                               max_doppler=args.max_doppler)
+
+def cmd_fr24_batch(args):
+    from FR24_track_preproc import FR24TrackStore, load_batch_config, process_measurement_batch
+    csv_files, measurements = load_batch_config(args.config_file)
+    track_store = FR24TrackStore(csv_files)
+    failed = process_measurement_batch(measurements, track_store, max_workers=args.workers)
+    return 1 if failed else 0
+
+def cmd_info(args):
+    from iq_header import IQHeader
+    for file_name in args.iqf_files:
+        with open(file_name, "rb") as file_descr:
+            iq_header_bytes = file_descr.read(1024)
+        if len(iq_header_bytes) != 1024:
+            logging.error("{:s}: Incomplete IQ header".format(file_name))
+            continue
+        iq_header = IQHeader()
+        iq_header.decode_header(iq_header_bytes)
+        logging.info("File: {:s}".format(file_name))
+        if iq_header.check_sync_word():
+            logging.warning("Sync word mismatch")
+        iq_header.dump_header()
+
+def cmd_verify(args):
+    import json
+    from iq_verify import verify_measurement
+    from iq_header import IQHeader
+    report = verify_measurement(args.iq_path,
+                                known_header_versions=args.header_version or IQHeader.KNOWN_HEADER_VERSIONS,
+                                max_workers=args.workers)
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    return 0 if report["passed"] else 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="vega_cli", description="VEGA database tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    # analyze
+    analyze = subparsers.add_parser("analyze", help="Analyze the IQ frames of a measurement")
+    analyze.add_argument("iq_path", help="Folder of the .iqf files")
+    analyze.add_argument("res_path", help="Folder where the results are saved")
+    analyze.add_argument("--no-time-stamp", action="store_true", help="Disable time stamp analysis")
+    analyze.add_argument("--no-cpi-index", action="store_true", help="Disable CPI index analysis")
+    analyze.add_argument("--no-sync", action="store_true", help="Disable sync flag analysis")
+    analyze.add_argument("--no-overdrive", action="store_true", help="Disable overdrive analysis")
+    analyze.add_argument("--no-frame-type", action="store_true", help="Disable frame type analysis")
+    analyze.add_argument("--no-rx-gain", action="store_true", help="Disable rx gain analysis")
+    analyze.add_argument("--payload", action="store_true", help="Enable payload analysis")
+    analyze.add_argument("--clip-level", type=float, default=1.0, help="Absolute I/Q value considered as clipped")
+    analyze.add_argument("--chunk-size", type=int, default=64, help="Frames per payload processing chunk")
+    analyze.add_argument("--workers", type=int, default=None, help="Payload analysis worker threads")
+    analyze.add_argument("--clipping-alarm", type=float, default=1e-3, help="Clipped sample ratio alarm threshold")
+    analyze.add_argument("--imbalance-alarm", type=float, default=3, help="Power imbalance alarm threshold [dB]")
+    analyze.add_argument("--no-decimation", action="store_true", help="Plot every data point")
+    analyze.add_argument("--max-points", type=int, default=10000, help="Maximum number of points per plotted trace (at least 6)")
+    analyze.set_defaults(func=cmd_analyze)
+    
+    # convert-matlab
+    convert = subparsers.add_parser("convert-matlab", help="Convert IQ frames to MATLAB files")
+    convert.add_argument("fname_prefix", help="Filename without the counter value")
+    convert.add_argument("start_index", type=int)
+    convert.add_argument("stop_index", type=int)
+    convert.add_argument("--dump-header", action="store_true", help="Print the IQ headers during conversion")
+    convert.set_defaults(func=cmd_convert_matlab)
+    
+    # export-mat73
+    export = subparsers.add_parser("export-mat73", help="Export a measurement into a single MATLAB v7.3 file")
+    export.add_argument("iq_path", help="Folder of the .iqf files")
+    export.add_argument("output_file", help="Exported .mat file")
+    export.add_argument("--chunk-size", type=int, default=16, help="Frames loaded and written at once")
+    export.add_argument("--all-frames", action="store_true", help="Export non data frames as well")
+    export.set_defaults(func=cmd_export_mat73)
+    
+    # fr24-preproc
+    fr24 = subparsers.add_parser("fr24-preproc", help="Generate target reference tracks from FlightRadar24 data")
+    fr24.add_argument("vega_measurement_path")
+    fr24.add_argument("--center-freq", type=float, required=True, help="Illuminator center frequency [Hz]")
+    fr24.add_argument("--radar", type=float, nargs=4, required=True, metavar=("LAT", "LON", "ELE", "BEARING"),
+                      help="Radar position [deg, deg, m] and bearing [deg]")
+    fr24.add_argument("--ioo", type=float, nargs=3, required=True, metavar=("LAT", "LON", "ELE"),
+                      help="Illuminator position [deg, deg, m]")
+    fr24.add_argument("--max-range", type=float, default=None,
+                      help="Process only the targets within this bistatic range [m]")
+    fr24.add_argument("--max-doppler", type=float, default=None,
+                      help="Process only the targets within this absolute bistatic Doppler [Hz]")
+    fr24.set_defaults(func=cmd_fr24_preproc)
+    
+    # fr24-batch
+    fr24_batch = subparsers.add_parser("fr24-batch", help="Generate target reference tracks for multiple measurements")
+    fr24_batch.add_argument("config_file", help="JSON batch configuration, see FR24_track_preproc.load_batch_config")
+    fr24_batch.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    fr24_batch.set_defaults(func=cmd_fr24_batch)
+    
+    # info
+    info = subparsers.add_parser("info", help="Print the header of IQ frames")
+    info.add_argument("iqf_files", nargs="+")
+    info.set_defaults(func=cmd_info)
+    
+    # verify
+    verify = subparsers.add_parser("verify", help="Verify the integrity of the IQ frames of a measurement")
+    verify.add_argument("iq_path", help="Folder of the .iqf files")
+    verify.add_argument("-o", "--output", default=None, help="JSON report file (default: stdout)")
+    verify.add_argument("--header-version", type=int, action="append", help="Accepted header version (repeatable)")
+    verify.add_argument("--workers", type=int, default=None, help="Number of worker threads")
+    verify.set_defaults(func=cmd_verify)
+    
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "analyze" and args.max_points < 6:
+        parser.error("--max-points must be at least 6")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return args.func(args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())